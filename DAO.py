@@ -1,18 +1,38 @@
-from models import ExerciseType, Exercise, Category, Workout, Set
+from models import ExerciseType, ExerciseMetric, Exercise, Category, Workout, Set, SetMetric, SessionTemplate, TemplateExercise, Program, ProgramDay
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert, literal, text, select, union_all
+from sqlalchemy.exc import IntegrityError
 from db_utils import get_session
+from archive import archived_set, archived_set_metric, get_set_history, build_archived_sets, restore_workout, archive_old_workouts, ARCHIVE_HORIZON_DAYS
+from search import search_exercise_ids, SEARCH_LIMIT
+from events import event_bus, CREATED, UPDATED, DELETED
+import training_load  # Registers the flush hooks that keep the load buckets current
 from models import ExerciseType, Exercise  # Import your model classes
 
+#Metric labels and value types of each measurement type an exercise can be added with
+MEASUREMENT_TYPES = {
+    'Distance and Time': [('mi', 'float'), ('mins', 'float')],
+    'Weight and Reps': [('lbs', 'float'), ('reps', 'int')],
+    'Weight, Reps and RPE': [('lbs', 'float'), ('reps', 'int'), ('RPE', 'float')]
+}
+
 class ExerciseTypeDAO:
     def __init__(self, session):
         self.session = session
 
-    def create_exercise_type(self, metric_1, metric_2, metric_label_1, metric_label_2, exercise):
+    def create_exercise_type(self, metric_1, metric_2, metric_label_1, metric_label_2, exercise, extra_metrics=(), value_types=('float', 'int')):
+        # extra_metrics is a list of (label, value_type) tracked after the first two metrics
+        metric_definitions = [(metric_label_1, value_types[0]), (metric_label_2, value_types[1])] + list(extra_metrics)
         exercise_type = ExerciseType(
             metric_1=metric_1,
             metric_2=metric_2,
             metric_label_1=metric_label_1,
             metric_label_2=metric_label_2,
-            exercise = exercise
+            exercise = exercise,
+            metrics = [
+                ExerciseMetric(position=position, label=label, value_type=value_type)
+                for position, (label, value_type) in enumerate(metric_definitions)
+            ]
         )
         self.session.add(exercise_type)
         self.session.commit()
@@ -23,6 +43,11 @@ class ExerciseTypeDAO:
 
     def get_exercise_type_by_exercise_id(self, exercise_id):
         return self.session.query(ExerciseType).filter_by(exercise_id=exercise_id).first()
+
+    def get_metric_definitions(self, exercise_id):
+        return self.session.query(ExerciseMetric).join(ExerciseMetric.exercise_type).filter(
+            ExerciseType.exercise_id == exercise_id
+        ).order_by(ExerciseMetric.position).all()
     
     def update_exercise_type_by_id(self, exercise_type_id, metric_1, metric_2, metric_label_1, metric_label_2):
         # Get the ExerciseType object by its ID
@@ -33,6 +58,8 @@ class ExerciseTypeDAO:
         exercise_type.metric_2 = metric_2
         exercise_type.metric_label_1 = metric_label_1
         exercise_type.metric_label_2 = metric_label_2
+        for metric in exercise_type.metrics[:2]:
+            metric.label = metric_label_1 if metric.position == 0 else metric_label_2
         
         # Commit the changes to the session
         self.session.commit()
@@ -50,11 +77,18 @@ class ExerciseDAO:
         )
         self.session.add(exercise)
         self.session.commit()
+        event_bus.publish('exercise', CREATED, exercise.id, category_id=exercise.category_id)
         return exercise
 
     def get_exercise_by_id(self, exercise_id):
         return self.session.query(Exercise).filter_by(id=exercise_id).one_or_none()
 
+    def get_exercise_by_name(self, name):
+        return self.session.query(Exercise).filter(func.lower(Exercise.name) == name.lower()).first()
+
+    def get_all(self):
+        return self.session.query(Exercise).order_by(Exercise.category_id, Exercise.name).all()
+
     def get_exercise_sets(self, exercise):
         return exercise.sets
     
@@ -75,6 +109,14 @@ class ExerciseDAO:
     
     def get_exercise_by_category(self, category):
         return self.session.query(Exercise).filter_by(category_id=category.id).all()
+
+    def search_exercises(self, search_text, limit=SEARCH_LIMIT):
+        #Best matches first, see search.py
+        exercise_ids = search_exercise_ids(self.session, search_text, limit)
+        if not exercise_ids:
+            return []
+        exercises = {exercise.id: exercise for exercise in self.session.query(Exercise).filter(Exercise.id.in_(exercise_ids))}
+        return [exercises[exercise_id] for exercise_id in exercise_ids if exercise_id in exercises]
     
     def get_exercise_type(self, exercise):
         return exercise.exercise_type
@@ -82,14 +124,20 @@ class ExerciseDAO:
     def get_exercise_workouts(self, exercise):
         return exercise.workouts
 
+    def get_exercise_history(self, exercise, start_date=None, end_date=None):
+        return get_set_history(self.session, start_date, end_date, exercise_id=exercise.id)
+
     def update_exercise_name(self, exercise, new_name):        
         exercise.name = new_name
         self.session.commit()
+        event_bus.publish('exercise', UPDATED, exercise.id, category_id=exercise.category_id)
         return exercise
     
     def delete_exercise(self, exercise):
+        exercise_id, category_id = exercise.id, exercise.category_id
         self.session.delete(exercise)
         self.session.commit()
+        event_bus.publish('exercise', DELETED, exercise_id, category_id=category_id)
 
     def delete_sets_in_workout(self, workout_id, exercise_id):
         workout = self.session.query(Workout).get(workout_id)
@@ -102,8 +150,10 @@ class ExerciseDAO:
         ).all()
 
         for set in self.sets:
+            set_id = set.id
             self.session.delete(set)
             self.session.commit()
+            event_bus.publish('set', DELETED, set_id, workout_id=workout_id, exercise_id=exercise_id)
     
 class CategoryDAO:
     def __init__(self, session):
@@ -113,6 +163,7 @@ class CategoryDAO:
         new_category = Category(name=name)
         self.session.add(new_category)
         self.session.commit()
+        event_bus.publish('category', CREATED, new_category.id)
         return new_category
     
     def get_category_by_id(self, category_id):
@@ -127,26 +178,82 @@ class CategoryDAO:
     def update_category_name(self, category, name):
         category.name = name
         self.session.commit()
+        event_bus.publish('category', UPDATED, category.id)
         return category
     
     def delete_category(self, category):
+        category_id = category.id
         self.session.delete(category)
         self.session.commit()
+        event_bus.publish('category', DELETED, category_id)
 
 class SetDAO:
     def __init__(self, session):
         self.session = session
 
-    def create_set(self, metric_1, metric_2, timestamp, workout, exercise):
+    def create_set(self, metric_1, metric_2, timestamp, workout, exercise, extra_values=()):
+        # Every metric goes into set_metric, metric_1/metric_2 keep a copy of the first two for older screens
+        planned_set = self.get_next_planned_set(workout, exercise)
+        if planned_set is not None:
+            self.log_planned_set(planned_set, metric_1, metric_2, timestamp, extra_values)
+            self.session.commit()
+            event_bus.publish('set', UPDATED, planned_set.id, workout_id=planned_set.workout_id, exercise_id=planned_set.exercise_id)
+            return planned_set
         new_set = Set(
             metric_1=metric_1,
             metric_2=metric_2,
             timestamp=timestamp,
             workout=workout,
-            exercise=exercise
+            exercise=exercise,
+            metric_values=self.build_metric_values([metric_1, metric_2] + list(extra_values))
             )
         self.session.add(new_set)
         self.session.commit()
+        event_bus.publish('set', CREATED, new_set.id, workout_id=new_set.workout_id, exercise_id=new_set.exercise_id)
+        return new_set
+
+    def create_sets(self, set_rows):
+        # Bulk version of create_set, every row is a dict of create_set's arguments and all of them share one commit
+        new_sets = []
+        logged_sets = []
+        for row in set_rows:
+            planned_set = self.get_next_planned_set(row['workout'], row['exercise'])
+            if planned_set is not None:
+                self.log_planned_set(planned_set, row['metric_1'], row['metric_2'], row['timestamp'], row.get('extra_values', ()))
+                logged_sets.append(planned_set)
+                continue
+            new_set = Set(
+                metric_1=row['metric_1'],
+                metric_2=row['metric_2'],
+                timestamp=row['timestamp'],
+                workout=row['workout'],
+                exercise=row['exercise'],
+                metric_values=self.build_metric_values([row['metric_1'], row['metric_2']] + list(row.get('extra_values', ())))
+            )
+            self.session.add(new_set)
+            new_sets.append(new_set)
+        self.session.commit()
+        for logged_set in logged_sets:
+            event_bus.publish('set', UPDATED, logged_set.id, workout_id=logged_set.workout_id, exercise_id=logged_set.exercise_id)
+        for new_set in new_sets:
+            event_bus.publish('set', CREATED, new_set.id, workout_id=new_set.workout_id, exercise_id=new_set.exercise_id)
+        return logged_sets + new_sets
+
+    def get_next_planned_set(self, workout, exercise):
+        #A set logged on a day that planned the exercise is the first of its planned sets being performed
+        if workout.id is None or exercise.id is None:
+            return None
+        return self.session.query(Set).filter(
+            Set.workout_id == workout.id, Set.exercise_id == exercise.id, Set.planned == True
+        ).order_by(Set.id).first()
+
+    def log_planned_set(self, planned_set, metric_1, metric_2, timestamp, extra_values=()):
+        # Clearing planned is what moves the set into training load and reports, see training_load.py
+        planned_set.metric_1 = metric_1
+        planned_set.metric_2 = metric_2
+        planned_set.timestamp = timestamp
+        planned_set.metric_values = self.build_metric_values([metric_1, metric_2] + list(extra_values))
+        planned_set.planned = False
     
     def get_set_by_id(self, set_id):
         return self.session.query(Set).filter_by(id=set_id).one_or_none()
@@ -156,16 +263,54 @@ class SetDAO:
     
     def get_set_by_exercise(self, exercise):
         return self.session.query(Set).filter(exercise_id=exercise.id).all()
+
+    def build_metric_values(self, values):
+        return [
+            SetMetric(position=position, value=float(value))
+            for position, value in enumerate(values) if value is not None and value != ''
+        ]
+
+    def get_metric_summary(self, exercise, start_date=None, end_date=None):
+        # One row per metric position: (position, count, min, max, avg, total), archived sets included
+        hot = select(SetMetric.position, SetMetric.value).join(SetMetric.set).where(Set.exercise_id == exercise.id, Set.planned == False)
+        cold = select(archived_set_metric.c.position, archived_set_metric.c.value).join(archived_set).where(
+            archived_set.c.exercise_id == exercise.id
+        )
+        if start_date is not None or end_date is not None:
+            hot = hot.join(Set.workout)
+            if start_date is not None:
+                hot = hot.where(Workout.date >= start_date)
+                cold = cold.where(archived_set.c.workout_date >= start_date)
+            if end_date is not None:
+                hot = hot.where(Workout.date <= end_date)
+                cold = cold.where(archived_set.c.workout_date <= end_date)
+        values = union_all(hot, cold).subquery()
+        return self.session.execute(
+            select(
+                values.c.position,
+                func.count(values.c.value),
+                func.min(values.c.value),
+                func.max(values.c.value),
+                func.avg(values.c.value),
+                func.sum(values.c.value)
+            ).group_by(values.c.position).order_by(values.c.position)
+        ).all()
     
-    def update_set(self, set, metric_1, metric_2):
+    def update_set(self, set, metric_1, metric_2, extra_values=None):
         set.metric_1 = metric_1
         set.metric_2 = metric_2
+        if extra_values is None:
+            extra_values = set.get_metric_values()[2:]
+        set.metric_values = self.build_metric_values([metric_1, metric_2] + list(extra_values))
         self.session.commit()
+        event_bus.publish('set', UPDATED, set.id, workout_id=set.workout_id, exercise_id=set.exercise_id)
         return set
 
     def delete_set(self, set):
+        set_id, workout_id, exercise_id = set.id, set.workout_id, set.exercise_id
         self.session.delete(set)
         self.session.commit()
+        event_bus.publish('set', DELETED, set_id, workout_id=workout_id, exercise_id=exercise_id)
 
 class WorkoutDAO:
     def __init__(self, session):
@@ -174,18 +319,70 @@ class WorkoutDAO:
     def create_workout(self, date):
         new_workout = Workout(date = date)
         self.session.add(new_workout)
-        self.session.commit()
+        try:
+            self.session.commit()
+        except IntegrityError:
+            # Another session created the date first, workout.date is unique so theirs is used
+            self.session.rollback()
+            return self.get_workout_by_date(date)
+        event_bus.publish('workout', CREATED, new_workout.id)
         return new_workout
     
     def get_workout_by_id(self, workout_id):
         return self.session.query(Workout).filter_by(id=workout_id).one_or_none()
     
     def get_workout_by_date(self, workout_date):
+        # Read only, an archived workout stays in the archive, see get_archived_sets_dict
         return self.session.query(Workout).filter_by(date=workout_date).one_or_none()
+
+    def get_archived_sets_dict(self, workout_date) ->dict:
+        #Archived sets of a date keyed by exercise like get_workout_sets_dict, the sets are not in the session
+        sets_dict = {}
+        for set in build_archived_sets(self.session, workout_date):
+            exercise = self.session.get(Exercise, set.exercise_id) if set.exercise_id is not None else None
+            if exercise is not None:
+                sets_dict.setdefault(exercise, []).append(set)
+        return sets_dict
+
+    def restore_workout(self, workout_date):
+        #Bring an archived workout back into the hot database before it is edited
+        workout = restore_workout(self.session, workout_date)
+        if workout is not None:
+            self.session.commit()
+            event_bus.publish('workout', CREATED, workout.id)
+        return workout
+
+    def archive_old_workouts(self, horizon_days=ARCHIVE_HORIZON_DAYS) ->int:
+        return archive_old_workouts(self.session, horizon_days)
+
+    def get_or_add_workout(self, workout_date):
+        # Like create_workout but leaves the commit to the caller so new workouts can join a bulk insert,
+        # an archived workout is restored since the caller is about to edit it
+        workout = self.get_workout_by_date(workout_date)
+        if workout is None:
+            workout = restore_workout(self.session, workout_date)
+        if workout is None:
+            workout = Workout(date = workout_date)
+            self.session.add(workout)
+            try:
+                self.session.flush()
+            except IntegrityError:
+                # Another session added the date first. The rollback drops anything else pending,
+                # so callers get their workouts before adding other changes
+                self.session.rollback()
+                workout = self.get_workout_by_date(workout_date)
+        return workout
+
+    def get_set_history(self, start_date=None, end_date=None):
+        return get_set_history(self.session, start_date, end_date)
    
     def get_workout_sets_dict(self, workout) ->dict:
+        # Queried rather than read from workout.sets, which goes stale when the write queue adds sets on its own session
         sets_dict = {}
-        for set in workout.sets:
+        for set in self.get_workout_sets(workout):
+            if set.exercise is None:
+                # Left behind by a deleted exercise or category, there is nothing to show it under
+                continue
             if set.exercise not in sets_dict.keys():
                 sets_dict[set.exercise] = [set]
             else:
@@ -202,6 +399,166 @@ class WorkoutDAO:
         return reset_workout
 
     def delete_workout(self, workout):
+        workout_id = workout.id
         self.session.delete(workout)
         self.session.commit()
+        event_bus.publish('workout', DELETED, workout_id)
+
+class ProgramDAO:
+    def __init__(self, session):
+        self.session = session
+
+    def create_template(self, name, exercises):
+        #exercises is a list of dicts with exercise, target_sets, metric_1 and metric_2
+        template = SessionTemplate(name=name, exercises=[
+            TemplateExercise(
+                position=position,
+                exercise=entry['exercise'],
+                target_sets=entry['target_sets'],
+                metric_1=entry.get('metric_1'),
+                metric_2=entry.get('metric_2')
+            )
+            for position, entry in enumerate(exercises)
+        ])
+        self.session.add(template)
+        self.session.commit()
+        event_bus.publish('template', CREATED, template.id)
+        return template
+
+    def get_all_templates(self):
+        return self.session.query(SessionTemplate).order_by(SessionTemplate.name).all()
+
+    def delete_template(self, template):
+        template_id = template.id
+        self.session.query(ProgramDay).filter_by(template_id=template_id).delete()
+        self.session.delete(template)
+        self.session.commit()
+        event_bus.publish('template', DELETED, template_id)
+
+    def create_program(self, name, weeks, schedule):
+        #schedule maps a weekday (0 is Monday) to the template trained that day
+        program = Program(name=name, weeks=weeks, days=[
+            ProgramDay(weekday=weekday, template=template) for weekday, template in sorted(schedule.items())
+        ])
+        self.session.add(program)
+        self.session.commit()
+        event_bus.publish('program', CREATED, program.id)
+        return program
+
+    def get_all_programs(self):
+        return self.session.query(Program).order_by(Program.name).all()
+
+    def delete_program(self, program):
+        program_id = program.id
+        self.session.delete(program)
+        self.session.commit()
+        event_bus.publish('program', DELETED, program_id)
+
+    def get_program_dates(self, program, start_date):
+        # The block starts on the Monday of the week holding start_date, days before start_date are skipped
+        start = date.fromisoformat(start_date) if isinstance(start_date, str) else start_date
+        monday = start - timedelta(days=start.weekday())
+        planned = []
+        for week in range(program.weeks):
+            for day in program.days:
+                day_date = monday + timedelta(weeks=week, days=day.weekday)
+                if day_date >= start:
+                    planned.append((day_date.strftime('%Y-%m-%d'), day.template))
+        return planned
+
+    def materialize_program(self, program, start_date):
+        #Write every planned workout and set of the block in one transaction with bulk inserts, returns the number of sets.
+        #The sets are written as planned, they count towards training load and reports once they are logged.
+        planned = self.get_program_dates(program, start_date)
+        # Days that already have sets, hot or archived, were trained or materialized before and are left alone
+        planned_dates = {day for day, template in planned}
+        trained = set(self.session.execute(union_all(
+            select(Workout.date).join(Set, Set.workout_id == Workout.id).where(Workout.date.in_(planned_dates)),
+            select(archived_set.c.workout_date).where(archived_set.c.workout_date.in_(planned_dates))
+        )).scalars())
+        planned = [(day, template) for day, template in planned if day not in trained]
+        if not planned:
+            return 0
+        dates = sorted({day for day, template in planned})
+        workout_ids = dict(self.session.query(Workout.date, Workout.id).filter(Workout.date.in_(dates)).all())
+        new_dates = [day for day in dates if day not in workout_ids]
+        if new_dates:
+            new_workouts = self.session.execute(
+                insert(Workout).returning(Workout.id, Workout.date, sort_by_parameter_order=True),
+                [{'date': day} for day in new_dates]
+            ).all()
+            workout_ids.update({day: workout_id for workout_id, day in new_workouts})
+
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        set_rows = [
+            {'metric_1': entry.metric_1, 'metric_2': entry.metric_2, 'timestamp': timestamp,
+             'workout_id': workout_ids[day], 'exercise_id': entry.exercise_id, 'planned': True}
+            for day, template in planned for entry in template.exercises for _ in range(entry.target_sets or 0)
+        ]
+        if not set_rows:
+            self.session.commit()
+            return 0
+        set_ids = self.session.execute(
+            insert(Set).returning(Set.id, sort_by_parameter_order=True), set_rows
+        ).scalars().all()
+        metric_rows = [
+            {'set_id': set_id, 'position': position, 'value': float(value)}
+            for set_id, row in zip(set_ids, set_rows)
+            for position, value in enumerate((row['metric_1'], row['metric_2'])) if value is not None
+        ]
+        if metric_rows:
+            self.session.execute(insert(SetMetric), metric_rows)
+        self.session.commit()
+
+        for day in new_dates:
+            event_bus.publish('workout', CREATED, workout_ids[day])
+        for set_id, row in zip(set_ids, set_rows):
+            event_bus.publish('set', CREATED, set_id, workout_id=row['workout_id'], exercise_id=row['exercise_id'])
+        return len(set_ids)
+
+    def copy_workout(self, workout, new_date):
+        #Copy every set of a past workout to new_date with INSERT ... SELECT, the set rows never pass through Python
+        workout_dao = WorkoutDAO(self.session)
+        is_new = workout_dao.get_workout_by_date(new_date) is None
+        target = workout_dao.get_or_add_workout(new_date)
+        self.session.flush()
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        copies = sorted(self.session.execute(
+            insert(Set).from_select(
+                ['metric_1', 'metric_2', 'timestamp', 'exercise_id', 'workout_id', 'planned'],
+                select(Set.metric_1, Set.metric_2, literal(timestamp), Set.exercise_id, literal(target.id), Set.planned)
+                .where(Set.workout_id == workout.id).order_by(Set.id)
+            ).returning(Set.id, Set.exercise_id)
+        ).all())
+        # RETURNING rows come in no set order, but one INSERT hands out rowids in the order it inserts, so the
+        # copies sorted by id line up with the sources sorted by id. The insert holds the write lock, so the
+        # source rows read here are the ones it copied.
+        source_ids = self.session.execute(
+            select(Set.id).where(Set.workout_id == workout.id, Set.id.not_in([set_id for set_id, exercise_id in copies])).order_by(Set.id)
+        ).scalars().all()
+        if copies:
+            self.session.execute(text('''
+                INSERT INTO set_metric (set_id, position, value)
+                SELECT :set_id, position, value FROM set_metric WHERE set_id = :source_id'''),
+                [{'set_id': set_id, 'source_id': source_id} for (set_id, exercise_id), source_id in zip(copies, source_ids)]
+            )
+            training_load.record_inserted_sets(self.session, Set.id.in_([set_id for set_id, exercise_id in copies]))
+        self.session.commit()
+
+        if is_new:
+            event_bus.publish('workout', CREATED, target.id)
+        for set_id, exercise_id in copies:
+            event_bus.publish('set', CREATED, set_id, workout_id=target.id, exercise_id=exercise_id)
+        self.session.expire(target, ['sets'])
+        return target
+
+#Hands out one DAO of each type per manager, every DAO shares the manager's session
+class DAOManager:
+    def __init__(self, session) -> None:
+        self.session = session
+        self._instances = {}
 
+    def get_instance(self, dao_class):
+        if dao_class not in self._instances:
+            self._instances[dao_class] = dao_class(self.session)
+        return self._instances[dao_class]
@@ -0,0 +1,162 @@
+"""
+Description: Hot/cold archival for the workout database. Workouts older than the archive
+horizon are moved out of WorkoutApp.db into WorkoutArchive.db, which db_utils attaches to
+every connection as the 'archive' schema. Archived sets are stored as one narrow row per set
+with the workout date folded in, so history queries can union them with the hot tables and
+the hot database stays small. Every metric of an archived set is kept in archived_set_metric, a narrow
+(set, position, value) table like set_metric.
+"""
+
+from datetime import date, timedelta
+from sqlalchemy import MetaData, Table, Column, Integer, Float, String, Index, ForeignKey, select, insert, delete, func, union_all
+from db_utils import engine
+from models import Workout, Set, SetMetric, workout_exercise
+
+ARCHIVE_HORIZON_DAYS = 365
+
+#Define the archive tables, these live in the attached archive database
+archive_metadata = MetaData(schema='archive')
+
+archived_set = Table(
+    'archived_set',
+    archive_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('workout_date', String),
+    Column('timestamp', String),
+    Column('exercise_id', Integer),
+    Column('metric_1', Float),
+    Column('metric_2', Integer),
+    Index('ix_archived_set_date', 'workout_date'),
+    Index('ix_archived_set_exercise_date', 'exercise_id', 'workout_date')
+)
+
+archived_set_metric = Table(
+    'archived_set_metric',
+    archive_metadata,
+    Column('set_id', Integer, ForeignKey('archive.archived_set.id'), primary_key=True),
+    Column('position', Integer, primary_key=True),
+    Column('value', Float),
+    sqlite_with_rowid=False
+)
+
+def initialize_archive(bind=engine):
+    archive_metadata.create_all(bind)
+
+def get_archive_cutoff(horizon_days=ARCHIVE_HORIZON_DAYS, today=None):
+    today = today or date.today()
+    return (today - timedelta(days=horizon_days)).strftime('%Y-%m-%d')
+
+def archive_old_workouts(session, horizon_days=ARCHIVE_HORIZON_DAYS, today=None, vacuum=True) ->int:
+    #Move every set from workouts older than the horizon into the archive in one transaction.
+    #Planned sets that were never logged are dropped, the archive only holds performed sets.
+    cutoff = get_archive_cutoff(horizon_days, today)
+    old_workout_ids = select(Workout.id).where(Workout.date < cutoff)
+    old_set_ids = select(Set.id).where(Set.workout_id.in_(old_workout_ids))
+    performed_set_ids = old_set_ids.where(Set.planned == False)
+    sync = {'synchronize_session': 'fetch'}
+
+    # Archived ids are handed out in hot id order after the current maximum, so each set's metrics can follow it
+    first_id = session.scalar(select(func.coalesce(func.max(archived_set.c.id), 0))) + 1
+    number = func.row_number().over(order_by=Set.id) - 1
+    numbered_sets = select(Set.id.label('set_id'), (first_id + number).label('archived_id')).where(Set.id.in_(performed_set_ids)).subquery()
+    archived = session.execute(
+        insert(archived_set).from_select(
+            ['id', 'workout_date', 'timestamp', 'exercise_id', 'metric_1', 'metric_2'],
+            select(numbered_sets.c.archived_id, Workout.date, Set.timestamp, Set.exercise_id, Set.metric_1, Set.metric_2)
+            .select_from(numbered_sets).join(Set, Set.id == numbered_sets.c.set_id).join(Set.workout)
+        )
+    ).rowcount
+    session.execute(
+        insert(archived_set_metric).from_select(
+            ['set_id', 'position', 'value'],
+            select(numbered_sets.c.archived_id, SetMetric.position, SetMetric.value)
+            .join(SetMetric, SetMetric.set_id == numbered_sets.c.set_id)
+        )
+    )
+    session.execute(delete(SetMetric).where(SetMetric.set_id.in_(old_set_ids)), execution_options=sync)
+    session.execute(delete(Set).where(Set.workout_id.in_(old_workout_ids)), execution_options=sync)
+    session.execute(delete(workout_exercise).where(workout_exercise.c.workout_id.in_(old_workout_ids)))
+    session.execute(delete(Workout).where(Workout.date < cutoff), execution_options=sync)
+    session.commit()
+
+    #Give the freed pages back to the file system so the hot database shrinks
+    if vacuum and archived:
+        with session.get_bind().connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('VACUUM main')
+            connection.exec_driver_sql('VACUUM archive')
+    return archived
+
+def get_newest_archived_date(session):
+    return session.scalar(select(func.max(archived_set.c.workout_date)))
+
+def build_archived_sets(session, workout_date):
+    #Sets of an archived workout as transient Set objects, for read-only views and for restoring it
+    rows = session.execute(
+        select(archived_set).where(archived_set.c.workout_date == workout_date).order_by(archived_set.c.id)
+    ).all()
+    metric_values = {}
+    for set_id, position, value in session.execute(
+        select(archived_set_metric).join(archived_set)
+        .where(archived_set.c.workout_date == workout_date).order_by(archived_set_metric.c.position)
+    ):
+        metric_values.setdefault(set_id, []).append(SetMetric(position=position, value=value))
+    return [
+        Set(
+            metric_1=row.metric_1, metric_2=row.metric_2, timestamp=row.timestamp, exercise_id=row.exercise_id,
+            metric_values=metric_values.get(row.id, [])
+        )
+        for row in rows
+    ]
+
+def restore_workout(session, workout_date):
+    #Move an archived workout back into the hot database so it can be edited, the caller commits
+    sets = build_archived_sets(session, workout_date)
+    if not sets:
+        return None
+    # Pending changes are flushed first so they still count towards the training load
+    session.flush()
+    # The archived sets never left the training load buckets, so they must not be counted again
+    session.info['skip_training_load'] = True
+    try:
+        workout = session.scalars(select(Workout).where(Workout.date == workout_date)).first()
+        if workout is None:
+            workout = Workout(date=workout_date)
+            session.add(workout)
+        for set_obj in sets:
+            set_obj.workout = workout
+            session.add(set_obj)
+        archived_ids = select(archived_set.c.id).where(archived_set.c.workout_date == workout_date)
+        session.execute(delete(archived_set_metric).where(archived_set_metric.c.set_id.in_(archived_ids)))
+        session.execute(delete(archived_set).where(archived_set.c.workout_date == workout_date))
+        session.flush()
+    finally:
+        session.info.pop('skip_training_load', None)
+    return workout
+
+def get_set_history(session, start_date=None, end_date=None, exercise_id=None):
+    #Rows of (date, timestamp, exercise_id, metric_1, metric_2) from the performed hot sets,
+    #unioned with the archive only when the date range reaches back into it
+    hot = select(
+        Workout.date.label('date'), Set.timestamp, Set.exercise_id, Set.metric_1, Set.metric_2
+    ).join(Set.workout).where(Set.planned == False)
+    cold = select(
+        archived_set.c.workout_date.label('date'), archived_set.c.timestamp, archived_set.c.exercise_id,
+        archived_set.c.metric_1, archived_set.c.metric_2
+    )
+    if start_date is not None:
+        hot = hot.where(Workout.date >= start_date)
+        cold = cold.where(archived_set.c.workout_date >= start_date)
+    if end_date is not None:
+        hot = hot.where(Workout.date <= end_date)
+        cold = cold.where(archived_set.c.workout_date <= end_date)
+    if exercise_id is not None:
+        hot = hot.where(Set.exercise_id == exercise_id)
+        cold = cold.where(archived_set.c.exercise_id == exercise_id)
+
+    newest_archived = get_newest_archived_date(session)
+    if newest_archived is not None and (start_date is None or start_date <= newest_archived):
+        history = union_all(hot, cold).subquery()
+        statement = select(history).order_by(history.c.date, history.c.timestamp)
+    else:
+        statement = hot.order_by(Workout.date, Set.timestamp)
+    return session.execute(statement).all()
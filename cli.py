@@ -0,0 +1,243 @@
+"""
+Description: Command line entry point for logging sets from scripts or watch integrations without
+starting the GUI. It never imports tkinter or workout_UI and calls straight into the DAOs.
+
+Examples:
+python cli.py log "Barbell Bench Press" 135 8
+python cli.py log "Barbell Squat" 225 5 --date 2023-08-14
+python cli.py show 2023-08-14
+python cli.py list exercises
+python cli.py load 2023-08-14
+python cli.py copy 2023-08-14 2023-08-21
+python cli.py batch < sets.csv      (lines of: date,exercise,metric_1,metric_2[,extra metrics...])
+python cli.py archive --days 365    (move workouts older than that into WorkoutArchive.db)
+python cli.py restore 2022-08-14
+Add --timings to any command to print the start up and command time to stderr.
+"""
+
+import time
+STARTED = time.perf_counter()
+
+import argparse
+import sys
+from datetime import date, datetime
+from db_utils import engine, get_session, remove_session, is_database_current
+from DAO import DAOManager, ExerciseDAO, ExerciseTypeDAO, SetDAO, WorkoutDAO, ProgramDAO
+from models import Category
+from archive import ARCHIVE_HORIZON_DAYS
+from training_load import get_training_load
+
+#The GUI logs every statement, a script only wants its own output
+engine.echo = False
+
+class CLIError(Exception):
+    pass
+
+def get_exercise(dao_manager, name):
+    exercise = dao_manager.get_instance(ExerciseDAO).get_exercise_by_name(name)
+    if exercise is None:
+        raise CLIError(f'No exercise named {name!r}, see: python cli.py list exercises')
+    return exercise
+
+def parse_date(value) ->str:
+    #Any ISO date is accepted and stored the way the GUI stores dates
+    try:
+        return date.fromisoformat(value).strftime('%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value!r} is not a date, use YYYY-MM-DD')
+
+def parse_number(value):
+    try:
+        return float(value)
+    except ValueError:
+        raise CLIError(f'{value!r} is not a number')
+
+def parse_values(dao_manager, exercise, values):
+    #Each value is checked against its metric's value_type, values past the defined metrics are plain numbers
+    metrics = dao_manager.get_instance(ExerciseTypeDAO).get_metric_definitions(exercise.id)
+    parsed = []
+    for position, value in enumerate(values):
+        if position >= len(metrics):
+            parsed.append(parse_number(value))
+            continue
+        try:
+            parsed.append(metrics[position].parse_value(value))
+        except ValueError:
+            raise CLIError(f'{value!r} is not a valid {metrics[position].label} ({metrics[position].value_type})')
+    return parsed
+
+def log_set(dao_manager, args):
+    exercise = get_exercise(dao_manager, args.exercise)
+    values = parse_values(dao_manager, exercise, [args.metric_1, args.metric_2] + args.extra)
+    workout_dao: WorkoutDAO = dao_manager.get_instance(WorkoutDAO)
+    workout = workout_dao.get_or_add_workout(args.date)
+    set_dao: SetDAO = dao_manager.get_instance(SetDAO)
+    new_set = set_dao.create_set(
+        metric_1=values[0],
+        metric_2=values[1],
+        timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        workout=workout,
+        exercise=exercise,
+        extra_values=values[2:]
+    )
+    print(f'Logged set {new_set.id}: {exercise.name} {new_set.metric_1:g} x {new_set.metric_2:g} on {args.date}')
+
+def show_workout(dao_manager, args):
+    workout_dao: WorkoutDAO = dao_manager.get_instance(WorkoutDAO)
+    workout = workout_dao.get_workout_by_date(args.date)
+    if workout is not None and workout.sets:
+        sets_dict = workout_dao.get_workout_sets_dict(workout)
+        title = f'Workout {args.date}'
+    else:
+        # Archived workouts are shown straight from the archive, showing them does not restore them
+        sets_dict = workout_dao.get_archived_sets_dict(args.date)
+        title = f'Workout {args.date} (archived)'
+    if not sets_dict:
+        print(f'No sets logged on {args.date}')
+        return
+    exercise_type_dao: ExerciseTypeDAO = dao_manager.get_instance(ExerciseTypeDAO)
+    print(title)
+    for exercise, sets in sets_dict.items():
+        metrics = exercise_type_dao.get_metric_definitions(exercise.id)
+        print(f'  {exercise.name}')
+        for set in sets:
+            values = [f'{metric.format_value(value)} {metric.label}' for value, metric in zip(set.get_metric_values(), metrics)]
+            print('    ' + '  '.join(values) + ('  (planned)' if set.planned else ''))
+
+def list_exercises(dao_manager, args):
+    for exercise in dao_manager.get_instance(ExerciseDAO).get_all():
+        print(f'{exercise.category.name}: {exercise.name}')
+
+def show_load(dao_manager, args):
+    training_load = get_training_load(dao_manager.session.get_bind())
+    training_load.load(dao_manager.session)
+    load = training_load.get_load(args.date)
+    ratio = load['acute_chronic_ratio']
+    print(f"Training load {load['date']}: {load['volume']:g} volume in {load['sets']} sets")
+    print(f"  7 day {load['acute']:g}, 28 day {load['chronic']:g}, acute:chronic {ratio if ratio is not None else '-'}")
+    print(f"  streak {training_load.get_streak(args.date)} days")
+    for category_id, volume in sorted(training_load.get_weekly_tonnage(args.date).items()):
+        category = dao_manager.session.get(Category, category_id)
+        print(f"  week {category.name if category else 'Uncategorized'}: {volume:g}")
+
+def copy_workout(dao_manager, args):
+    workout_dao: WorkoutDAO = dao_manager.get_instance(WorkoutDAO)
+    workout = workout_dao.get_workout_by_date(args.source)
+    if workout is None or not workout.sets:
+        if workout_dao.get_archived_sets_dict(args.source):
+            raise CLIError(f'{args.source} is archived, restore it first with: python cli.py restore {args.source}')
+        raise CLIError(f'No sets logged on {args.source}')
+    copy = dao_manager.get_instance(ProgramDAO).copy_workout(workout, args.target)
+    print(f'Copied {len(workout.sets)} sets from {args.source} to {args.target} ({len(copy.sets)} sets now)')
+
+def batch_log(dao_manager, args):
+    #Read every line first so the whole batch is written in one transaction
+    import csv
+    lines = [
+        row for row in csv.reader(sys.stdin)
+        if any(field.strip() for field in row) and not row[0].lstrip().startswith('#')
+    ]
+    parsed = []
+    for line_number, row in enumerate(lines, start=1):
+        if len(row) < 4:
+            raise CLIError(f'line {line_number}: expected date,exercise,metric_1,metric_2[,extra metrics...]')
+        try:
+            workout_date = parse_date(row[0].strip()) if row[0].strip() else date.today().strftime('%Y-%m-%d')
+        except argparse.ArgumentTypeError as error:
+            raise CLIError(f'line {line_number}: {error}')
+        exercise = get_exercise(dao_manager, row[1].strip())
+        parsed.append((workout_date, exercise, parse_values(dao_manager, exercise, row[2:])))
+
+    workout_dao: WorkoutDAO = dao_manager.get_instance(WorkoutDAO)
+    workouts = {workout_date: workout_dao.get_or_add_workout(workout_date) for workout_date in {row[0] for row in parsed}}
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    set_dao: SetDAO = dao_manager.get_instance(SetDAO)
+    new_sets = set_dao.create_sets([
+        {
+            'metric_1': values[0],
+            'metric_2': values[1],
+            'extra_values': values[2:],
+            'timestamp': timestamp,
+            'workout': workouts[workout_date],
+            'exercise': exercise
+        }
+        for workout_date, exercise, values in parsed
+    ])
+    print(f'Logged {len(new_sets)} sets across {len(workouts)} workouts')
+
+def archive_workouts(dao_manager, args):
+    archived = dao_manager.get_instance(WorkoutDAO).archive_old_workouts(args.days)
+    print(f'Archived {archived} sets from workouts older than {args.days} days')
+
+def restore_archived_workout(dao_manager, args):
+    workout = dao_manager.get_instance(WorkoutDAO).restore_workout(args.date)
+    if workout is None:
+        raise CLIError(f'No archived workout on {args.date}')
+    print(f'Restored {len(workout.sets)} sets on {args.date}')
+
+def build_parser():
+    today = date.today().strftime('%Y-%m-%d')
+    parser = argparse.ArgumentParser(description='Log and view workouts without the GUI.')
+    parser.add_argument('--timings', action='store_true', help='print start up and command time to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    log_parser = commands.add_parser('log', help='log one set')
+    log_parser.add_argument('exercise')
+    log_parser.add_argument('metric_1')
+    log_parser.add_argument('metric_2')
+    log_parser.add_argument('extra', nargs='*', help='values for any extra metrics, like RPE')
+    log_parser.add_argument('--date', type=parse_date, default=today)
+    log_parser.set_defaults(handler=log_set)
+
+    show_parser = commands.add_parser('show', help='show the sets logged on a date')
+    show_parser.add_argument('date', nargs='?', type=parse_date, default=today)
+    show_parser.set_defaults(handler=show_workout)
+
+    list_parser = commands.add_parser('list', help='list exercises')
+    list_parser.add_argument('what', choices=['exercises'])
+    list_parser.set_defaults(handler=list_exercises)
+
+    load_parser = commands.add_parser('load', help='show the training load for a date')
+    load_parser.add_argument('date', nargs='?', type=parse_date, default=today)
+    load_parser.set_defaults(handler=show_load)
+
+    copy_parser = commands.add_parser('copy', help='copy the sets of one workout to another date')
+    copy_parser.add_argument('source', type=parse_date)
+    copy_parser.add_argument('target', nargs='?', type=parse_date, default=today)
+    copy_parser.set_defaults(handler=copy_workout)
+
+    batch_parser = commands.add_parser('batch', help='log sets from stdin in one transaction')
+    batch_parser.set_defaults(handler=batch_log)
+
+    archive_parser = commands.add_parser('archive', help='move old workouts into the archive database')
+    archive_parser.add_argument('--days', type=int, default=ARCHIVE_HORIZON_DAYS, help='archive workouts older than this many days')
+    archive_parser.set_defaults(handler=archive_workouts)
+
+    restore_parser = commands.add_parser('restore', help='move an archived workout back so it can be edited')
+    restore_parser.add_argument('date', type=parse_date)
+    restore_parser.set_defaults(handler=restore_archived_workout)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    imported = time.perf_counter()
+    session = get_session()
+    try:
+        if not is_database_current(session.get_bind()):
+            # Only a new or out of date database pays for importing and running the migrations
+            from migrations import prepare_database
+            prepare_database(session)
+        args.handler(DAOManager(session), args)
+    except CLIError as error:
+        print(f'error: {error}', file=sys.stderr)
+        return 1
+    finally:
+        remove_session()
+    if args.timings:
+        finished = time.perf_counter()
+        print(f'start up {(imported - STARTED) * 1000:.1f} ms, command {(finished - imported) * 1000:.1f} ms, '
+              f'total {(finished - STARTED) * 1000:.1f} ms', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
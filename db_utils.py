@@ -1,23 +1,64 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 
 DATABASE_URL = 'sqlite:///WorkoutApp.db'
+ARCHIVE_PATH = 'WorkoutArchive.db'
 engine = create_engine(DATABASE_URL, echo=True)
 
+def configure_connections(engine, archive_path):
+    #Attach the cold archive to every connection so queries can union hot and archived rows
+    @event.listens_for(engine, 'connect')
+    def attach_archive(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+        # New databases are created with incremental vacuum, maintenance.py switches existing ones over
+        cursor.execute('PRAGMA main.auto_vacuum = INCREMENTAL')
+        cursor.close()
+
+configure_connections(engine, ARCHIVE_PATH)
+
 Session = sessionmaker(bind=engine)
-session = Session()
+
+#Each thread gets its own session from the registry, call remove_session() when the thread is done
+ScopedSession = scoped_session(Session)
 Base = declarative_base()
 
-def initialize_database():
-    Base.metadata.create_all(engine)
+def initialize_database(bind=engine):
+    Base.metadata.create_all(bind)
+
+#How many migrations migrations.py has, a database at this PRAGMA user_version needs no preparing
+SCHEMA_VERSION = 9
+
+def is_database_current(bind=engine) ->bool:
+    #Cheap check for the command line, so it only imports and runs migrations.py when there is work to do
+    with bind.connect() as connection:
+        if connection.exec_driver_sql('PRAGMA user_version').scalar() != SCHEMA_VERSION:
+            return False
+        return connection.exec_driver_sql(
+            "SELECT count(*) FROM archive.sqlite_master WHERE name = 'archived_set'"
+        ).scalar() > 0
 
 def get_session():
-    return session
+    return ScopedSession()
+
+def remove_session():
+    ScopedSession.remove()
 
 def get_fresh_session():
-    session = get_session()
-    if session.is_active:
+    remove_session()
+    return get_session()
+
+@contextmanager
+def session_scope():
+    #Explicit unit of work for background jobs: commit on success, roll back on error, always close
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
         session.close()
-        session = get_session()
-    return session
@@ -0,0 +1,65 @@
+"""
+Description: In-process change events. The DAOs publish a ChangeEvent after every committed
+write (set, exercise, category or workout created, updated or deleted) and the pages subscribe
+so they can patch just the rows that changed instead of rebuilding from the database.
+"""
+
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+ChangeEvent = namedtuple(
+    'ChangeEvent',
+    ['entity', 'action', 'id', 'workout_id', 'exercise_id', 'category_id'],
+    defaults=(None, None, None)
+)
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._deferred = threading.local()
+
+    def subscribe(self, entity, handler):
+        with self._lock:
+            self._subscribers.setdefault(entity, []).append(handler)
+
+    def unsubscribe(self, entity, handler):
+        with self._lock:
+            handlers = self._subscribers.get(entity, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    @contextmanager
+    def deferred(self):
+        #Collect the events published on this thread instead of sending them, the caller
+        #dispatches them once the writes are durable or drops them on rollback
+        collected = []
+        self._deferred.events = collected
+        try:
+            yield collected
+        finally:
+            self._deferred.events = None
+
+    def publish(self, entity, action, id, **parent_ids) ->ChangeEvent:
+        event = ChangeEvent(entity, action, id, **parent_ids)
+        deferred_events = getattr(self._deferred, 'events', None)
+        if deferred_events is not None:
+            deferred_events.append(event)
+        else:
+            self.dispatch(event)
+        return event
+
+    def dispatch(self, event):
+        # Copy the handlers so a handler can unsubscribe while we iterate
+        with self._lock:
+            handlers = list(self._subscribers.get(event.entity, []))
+        for handler in handlers:
+            handler(event)
+
+#Shared bus used by the DAOs and the pages
+event_bus = EventBus()
@@ -0,0 +1,306 @@
+"""
+Description: Load test for the DAO layer on SQLite. Simulates N users logging workouts at the same
+time, as threads or as processes, against a scratch database that is created and seeded for every
+run, so WorkoutApp.db is never touched. Each user does a mix of get_workout_by_date, create_set,
+get_sets_for_workout_and_exercise and delete_set calls. Runs are repeated for every concurrency
+level and database configuration (journal mode, synchronous) and the report gives throughput,
+latency percentiles, lock wait time and error rates for each.
+
+SQLite's own busy timeout is turned off for the test. When a call hits "database is locked" the
+harness rolls back, backs off and retries it, and the time spent retrying is the lock wait. A call
+still locked after --lock-timeout seconds counts as an error.
+
+The -queue configurations send create_set and delete_set through one shared WriteQueue (writer.py)
+instead of committing on each user's session, and report the queue's batch sizes next to the
+results, so the gain from group commit can be compared with the same journal mode without it.
+They share the queue between threads, so they only run with --mode thread.
+
+Example:
+python loadtest.py --users 1 2 4 8 --ops 200 --configs delete wal --output loadtest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import date, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from db_utils import Base
+from writer import WriteQueue, GroupCommitSession
+from archive import archive_metadata
+from search import create_search_index
+from models import Set
+from DAO import DAOManager, CategoryDAO, ExerciseDAO, ExerciseTypeDAO, SetDAO, WorkoutDAO
+import maintenance  # Registers maintenance_run so the scratch schema matches a real database
+
+CONFIGS = {
+    'delete': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'wal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+    'wal-full': {'journal_mode': 'WAL', 'synchronous': 'FULL'},
+    'memory-journal': {'journal_mode': 'MEMORY', 'synchronous': 'OFF'},
+    'delete-queue': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'write_queue': True},
+    'wal-queue': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'write_queue': True}
+}
+
+#Share of each operation in a user's session, reads dominate like they do in the app
+OPERATION_MIX = {
+    'get_workout_by_date': 35,
+    'create_set': 35,
+    'get_sets_for_workout_and_exercise': 20,
+    'delete_set': 10
+}
+
+SEED_DAYS = 30
+SEED_EXERCISES = {'Chest': ['Bench Press', 'Incline Press', 'Cable Fly'], 'Back': ['Barbell Row', 'Lat Pulldown'],
+                  'Legs': ['Squat', 'Deadlift', 'Leg Extension'], 'Arms': ['Curl', 'Triceps Pushdown']}
+
+def open_scratch_engine(scratch_dir, config, busy_timeout=0):
+    #Same connection setup as db_utils, pointed at the scratch files and using the configuration under test
+    engine = create_engine(f"sqlite:///{os.path.join(scratch_dir, 'WorkoutApp.db')}", connect_args={'timeout': busy_timeout})
+    archive_path = os.path.join(scratch_dir, 'WorkoutArchive.db')
+
+    @event.listens_for(engine, 'connect')
+    def configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+        cursor.execute(f"PRAGMA journal_mode = {config['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous = {config['synchronous']}")
+        cursor.close()
+    return engine
+
+def create_scratch_database(config, seed=0):
+    scratch_dir = tempfile.mkdtemp(prefix='workout_loadtest_')
+    engine = open_scratch_engine(scratch_dir, config)
+    Base.metadata.create_all(engine)
+    archive_metadata.create_all(engine)
+    with engine.begin() as connection:
+        create_search_index(connection)
+
+    session = sessionmaker(bind=engine)()
+    dao_manager = DAOManager(session)
+    exercises = []
+    for category_name, exercise_names in SEED_EXERCISES.items():
+        category = dao_manager.get_instance(CategoryDAO).create_category(category_name)
+        for exercise_name in exercise_names:
+            exercise = dao_manager.get_instance(ExerciseDAO).create_exercise(exercise_name, category)
+            dao_manager.get_instance(ExerciseTypeDAO).create_exercise_type(0, 0, 'lbs', 'reps', exercise)
+            exercises.append(exercise)
+
+    #A month of history so the reads have something to find
+    rng = random.Random(seed)
+    workout_dao: WorkoutDAO = dao_manager.get_instance(WorkoutDAO)
+    rows = []
+    for day in get_test_dates():
+        workout = workout_dao.get_or_add_workout(day)
+        for exercise in rng.sample(exercises, 3):
+            rows += [{'metric_1': rng.randint(50, 300), 'metric_2': rng.randint(3, 12), 'timestamp': f'{day} 18:00:00',
+                      'workout': workout, 'exercise': exercise} for _ in range(3)]
+    dao_manager.get_instance(SetDAO).create_sets(rows)
+    session.close()
+    engine.dispose()
+    return scratch_dir
+
+def get_test_dates(days=SEED_DAYS):
+    today = date.today()
+    return [(today - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+
+class SimulatedUser:
+    def __init__(self, dao_manager, exercise_ids, rng, write_queue=None):
+        self.dao_manager = dao_manager
+        self.write_queue = write_queue
+        self.session = dao_manager.session
+        self.exercise_ids = exercise_ids
+        self.rng = rng
+        self.dates = get_test_dates()
+        self.logged_set_ids = []
+
+    def get_workout_by_date(self):
+        self.dao_manager.get_instance(WorkoutDAO).get_workout_by_date(self.rng.choice(self.dates[:7]))
+
+    def create_set(self):
+        #Most sets go to today's workout, which is where the contention is at the gym
+        workout_dao: WorkoutDAO = self.dao_manager.get_instance(WorkoutDAO)
+        workout = workout_dao.get_or_add_workout(self.dates[0] if self.rng.random() < 0.8 else self.rng.choice(self.dates))
+        exercise_id = self.rng.choice(self.exercise_ids)
+        metric_1, metric_2, timestamp = self.rng.randint(50, 300), self.rng.randint(3, 12), time.strftime('%Y-%m-%d %H:%M:%S')
+        if self.write_queue is not None:
+            # Every seeded date already has its workout, so the queue does all of this user's writes
+            self.logged_set_ids.append(self.write_queue.create_set(metric_1, metric_2, timestamp, workout.id, exercise_id).result())
+            return
+        exercise = self.dao_manager.get_instance(ExerciseDAO).get_exercise_by_id(exercise_id)
+        new_set = self.dao_manager.get_instance(SetDAO).create_set(metric_1, metric_2, timestamp, workout, exercise)
+        self.logged_set_ids.append(new_set.id)
+
+    def get_sets_for_workout_and_exercise(self):
+        workout = self.dao_manager.get_instance(WorkoutDAO).get_workout_by_date(self.rng.choice(self.dates[:7]))
+        if workout is not None:
+            self.dao_manager.get_instance(ExerciseDAO).get_sets_for_workout_and_exercise(
+                workout.id, self.rng.choice(self.exercise_ids)
+            )
+
+    def delete_set(self):
+        # Users delete their own mistakes, so only sets this user logged
+        if not self.logged_set_ids:
+            return
+        if self.write_queue is not None:
+            self.write_queue.delete_set(self.logged_set_ids[-1]).result()
+            self.logged_set_ids.pop()
+            return
+        set_obj = self.session.get(Set, self.logged_set_ids[-1])
+        if set_obj is not None:
+            self.dao_manager.get_instance(SetDAO).delete_set(set_obj)
+        self.logged_set_ids.pop()
+
+def is_lock_error(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error.orig)
+
+def run_user(scratch_dir, config, user_number, operations, lock_timeout, seed=0, start_at=None, write_queue=None) ->list:
+    #One simulated user, returns (operation, latency, lock wait, error) for every call
+    engine = open_scratch_engine(scratch_dir, config)
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(seed * 1000 + user_number)
+    exercise_ids = [exercise.id for exercise in DAOManager(session).get_instance(ExerciseDAO).get_all()]
+    user = SimulatedUser(DAOManager(session), exercise_ids, rng, write_queue)
+    names = list(OPERATION_MIX)
+    weights = list(OPERATION_MIX.values())
+    samples = []
+    if start_at is not None:
+        # Every user starts at the same moment, otherwise the first ones finish before the last ones begin
+        time.sleep(max(0.0, start_at - time.time()))
+    try:
+        for _ in range(operations):
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            lock_wait = 0.0
+            backoff = 0.001
+            error = None
+            while True:
+                try:
+                    getattr(user, name)()
+                    break
+                except OperationalError as caught:
+                    session.rollback()
+                    waited = time.perf_counter() - started
+                    if not is_lock_error(caught) or waited >= lock_timeout:
+                        error = 'lock timeout' if is_lock_error(caught) else type(caught).__name__
+                        break
+                    pause = min(backoff, lock_timeout - waited) * (0.5 + rng.random())
+                    time.sleep(pause)
+                    lock_wait += pause
+                    backoff = min(backoff * 2, 0.1)
+                except Exception as caught:
+                    session.rollback()
+                    error = type(caught).__name__
+                    break
+            samples.append((name, time.perf_counter() - started, lock_wait, error))
+    finally:
+        session.close()
+        engine.dispose()
+    return samples
+
+def percentile(values, percent):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+def summarize(samples, elapsed) ->dict:
+    latencies = sorted(latency for _, latency, _, _ in samples)
+    errors = {}
+    for _, _, _, error in samples:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    lock_waits = [lock_wait for _, _, lock_wait, _ in samples]
+    by_operation = {}
+    for name in OPERATION_MIX:
+        operation_latencies = sorted(latency for sample_name, latency, _, _ in samples if sample_name == name)
+        by_operation[name] = {
+            'calls': len(operation_latencies),
+            'p50_ms': round(percentile(operation_latencies, 50) * 1000, 3) if operation_latencies else None,
+            'p95_ms': round(percentile(operation_latencies, 95) * 1000, 3) if operation_latencies else None
+        }
+    return {
+        'operations': len(samples),
+        'elapsed_seconds': round(elapsed, 4),
+        'throughput_per_second': round(len(samples) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else None,
+        'lock_wait_seconds': round(sum(lock_waits), 4),
+        'lock_waited_calls': sum(1 for lock_wait in lock_waits if lock_wait),
+        'error_rate': round(sum(errors.values()) / len(samples), 4) if samples else 0,
+        'errors': errors,
+        'by_operation': by_operation
+    }
+
+def run_level(config_name, users, operations, mode='thread', lock_timeout=5.0, seed=0, keep=False) ->dict:
+    config = CONFIGS[config_name]
+    if config.get('write_queue') and mode == 'process':
+        raise ValueError(f'{config_name} shares one write queue between threads, run it with --mode thread')
+    scratch_dir = create_scratch_database(config, seed)
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    write_queue = queue_engine = None
+    if config.get('write_queue'):
+        # The writer is the only one committing, it waits on readers with a normal busy timeout
+        queue_engine = open_scratch_engine(scratch_dir, config, busy_timeout=lock_timeout)
+        write_queue = WriteQueue(session_factory=sessionmaker(bind=queue_engine, class_=GroupCommitSession))
+    try:
+        with executor_class(max_workers=users) as executor:
+            # Processes take a while to start, give them a moment so the users really overlap
+            start_at = time.time() + (1.0 if mode == 'process' else 0.05)
+            futures = [
+                executor.submit(run_user, scratch_dir, config, user_number, operations, lock_timeout, seed, start_at, write_queue)
+                for user_number in range(users)
+            ]
+            samples = [sample for future in futures for sample in future.result()]
+        elapsed = time.time() - start_at
+    finally:
+        if write_queue is not None:
+            write_queue.close()
+            queue_engine.dispose()
+        if not keep:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    result = summarize(samples, elapsed)
+    result.update({'config': config_name, 'users': users, 'mode': mode})
+    if write_queue is not None:
+        result['write_queue'] = write_queue.get_metrics()
+    return result
+
+def print_result(result):
+    queue_metrics = result.get('write_queue')
+    print(f"{result['config']:<15}{result['mode']:<8}{result['users']:>5}{result['throughput_per_second']:>10}"
+          f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+          f"{result['lock_wait_seconds']:>11}{result['error_rate'] * 100:>8.2f}%"
+          f"{queue_metrics['average_batch'] if queue_metrics else '-':>11}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the DAO layer with simulated concurrent users.')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4, 8], help='concurrency levels to run')
+    parser.add_argument('--ops', type=int, default=200, help='operations per user')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=['delete', 'wal'])
+    parser.add_argument('--lock-timeout', type=float, default=5.0, help='seconds a call may wait on locks before it fails')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    print(f"{'config':<15}{'mode':<8}{'users':>5}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'lock wait':>11}{'errors':>9}{'avg batch':>11}")
+    results = []
+    for config_name in args.configs:
+        for users in args.users:
+            result = run_level(config_name, users, args.ops, args.mode, args.lock_timeout, args.seed)
+            print_result(result)
+            results.append(result)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Description: Routine SQLite maintenance for WorkoutApp.db. Deleting sets, resetting workouts and
+deleting categories leave free pages behind and the query planner has no statistics until ANALYZE
+runs. Every DELETE on a tracked engine adds its row count to that database's churn counter, and a
+run is due once churn, the share of free pages or the time since the last run passes its threshold.
+A run refreshes the planner statistics (ANALYZE the first time, PRAGMA optimize after that), hands
+free pages back with an incremental vacuum and runs PRAGMA quick_check. File size, free pages and
+duration before and after are printed and saved in the maintenance_run table. A run that fails
+(usually "database is locked" while the app is writing) is saved with its error, its churn is put
+back and the next check tries again. The app's engine is tracked on import, tenants.py tracks each
+tenant's engine and runs their maintenance with TenantRegistry.run_due_maintenance().
+
+The GUI runs maintenance on a background thread once the user has been idle for a while, or right
+away if churn gets very high. To run it by hand:
+python maintenance.py
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import Table, Column, Integer, Float, String, event, insert, select, func, inspect
+from db_utils import Base, engine
+
+CHURN_THRESHOLD = 500
+FORCE_CHURN_THRESHOLD = 5000
+FREE_PAGE_RATIO = 0.2
+RUN_INTERVAL_DAYS = 7
+IDLE_SECONDS = 60
+
+#Define the maintenance_run table, one row per run
+maintenance_run = Table(
+    'maintenance_run',
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('started', String),
+    Column('reason', String),
+    Column('churn', Integer),
+    Column('size_before', Integer),
+    Column('size_after', Integer),
+    Column('free_pages_before', Integer),
+    Column('free_pages_after', Integer),
+    Column('duration_ms', Float),
+    Column('quick_check', String),
+    Column('error', String)
+)
+
+class ChurnCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows_deleted = 0
+
+    def add(self, rows):
+        with self._lock:
+            self.rows_deleted += rows
+
+    def take(self) ->int:
+        with self._lock:
+            rows, self.rows_deleted = self.rows_deleted, 0
+            return rows
+
+#One counter per database file, so churn survives a tenant engine being disposed and opened again
+_churn_counters = {}
+_churn_counters_lock = threading.Lock()
+
+def get_churn(bind) ->ChurnCounter:
+    database = bind.engine.url.database
+    with _churn_counters_lock:
+        return _churn_counters.setdefault(database, ChurnCounter())
+
+def count_deleted_rows(connection, cursor, statement, parameters, context, executemany):
+    # Counts every delete, ORM cascades and bulk deletes included
+    if statement.lstrip()[:6].upper() == 'DELETE' and cursor.rowcount > 0:
+        get_churn(connection).add(cursor.rowcount)
+
+def track_churn(bind):
+    #Count the deletes on an engine towards its database's churn
+    if not event.contains(bind, 'after_cursor_execute', count_deleted_rows):
+        event.listen(bind, 'after_cursor_execute', count_deleted_rows)
+
+track_churn(engine)
+
+def get_database_stats(connection) ->dict:
+    page_size = connection.exec_driver_sql('PRAGMA page_size').scalar()
+    database = connection.engine.url.database
+    return {
+        'size': os.path.getsize(database) if os.path.exists(database) else 0,
+        'pages': connection.exec_driver_sql('PRAGMA page_count').scalar(),
+        'free_pages': connection.exec_driver_sql('PRAGMA freelist_count').scalar(),
+        'page_size': page_size
+    }
+
+def get_last_run(connection):
+    if not inspect(connection).has_table('maintenance_run'):
+        return None
+    # Failed runs do not count, maintenance is still due after one
+    return connection.execute(select(func.max(maintenance_run.c.started)).where(maintenance_run.c.error == None)).scalar()
+
+def get_due_reason(connection, pending_churn=None, now=None):
+    #Why maintenance should run now, or None if it is not due
+    pending_churn = get_churn(connection).rows_deleted if pending_churn is None else pending_churn
+    if pending_churn >= CHURN_THRESHOLD:
+        return 'churn'
+    stats = get_database_stats(connection)
+    if stats['pages'] and stats['free_pages'] / stats['pages'] >= FREE_PAGE_RATIO:
+        return 'free pages'
+    last_run = get_last_run(connection)
+    now = now or datetime.now()
+    if last_run is None or datetime.strptime(last_run, '%Y-%m-%d %H:%M:%S') < now - timedelta(days=RUN_INTERVAL_DAYS):
+        return 'interval'
+    return None
+
+def run_maintenance(reason='manual', max_pages=None, bind=engine) ->dict:
+    started = time.perf_counter()
+    churn = get_churn(bind)
+    pending_churn = churn.take()
+    result = {'started': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'reason': reason, 'churn': pending_churn}
+    try:
+        #VACUUM and ANALYZE cannot run inside a transaction, so the run uses an autocommit connection
+        with bind.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            result.update(vacuum_and_analyze(connection, max_pages))
+            result['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            maintenance_run.create(connection, checkfirst=True)
+            connection.execute(insert(maintenance_run).values(**result))
+    except Exception as error:
+        # The deletes still need cleaning up, so their churn counts towards the next run
+        churn.add(pending_churn)
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        result['error'] = str(error)
+        record_failed_run(result, bind)
+        print(f"maintenance ({reason}) failed after {result['duration_ms']} ms, will retry: {error}")
+        return result
+    print(f"maintenance ({reason}): {result['size_before']} -> {result['size_after']} bytes, "
+          f"free pages {result['free_pages_before']} -> {result['free_pages_after']}, "
+          f"{result['churn']} rows deleted since last run, quick_check {result['quick_check']}, {result['duration_ms']} ms")
+    return result
+
+def vacuum_and_analyze(connection, max_pages=None) ->dict:
+    before = get_database_stats(connection)
+
+    if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+        # Switching an existing database to incremental vacuum needs one full VACUUM
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM main')
+    else:
+        # A plain execute frees a single page per step, executescript runs the pragma to the end
+        pages = f'({int(max_pages)})' if max_pages else ''
+        connection.connection.driver_connection.executescript(f'PRAGMA main.incremental_vacuum{pages};')
+
+    if inspect(connection).has_table('sqlite_stat1'):
+        connection.exec_driver_sql('PRAGMA optimize')
+    else:
+        connection.exec_driver_sql('ANALYZE main')
+
+    check = connection.exec_driver_sql('PRAGMA main.quick_check').scalars().all()
+    after = get_database_stats(connection)
+    return {
+        'size_before': before['size'],
+        'size_after': after['size'],
+        'free_pages_before': before['free_pages'],
+        'free_pages_after': after['free_pages'],
+        'quick_check': 'ok' if check == ['ok'] else '; '.join(check)
+    }
+
+def record_failed_run(result, bind=engine):
+    try:
+        with bind.begin() as connection:
+            maintenance_run.create(connection, checkfirst=True)
+            connection.execute(insert(maintenance_run).values(**result))
+    except Exception as error:
+        print(f'could not record the failed maintenance run: {error}')
+
+class MaintenanceScheduler:
+    #Decides when to run, the caller reports user activity and calls check() now and then
+    def __init__(self, idle_seconds=IDLE_SECONDS, bind=engine):
+        self.idle_seconds = idle_seconds
+        self.bind = bind
+        self.last_activity = time.monotonic()
+        self.running = None
+
+    def touch(self, *args):
+        self.last_activity = time.monotonic()
+
+    def is_idle(self) ->bool:
+        return time.monotonic() - self.last_activity >= self.idle_seconds
+
+    def check(self):
+        if self.running is not None and self.running.is_alive():
+            return None
+        if get_churn(self.bind).rows_deleted >= FORCE_CHURN_THRESHOLD:
+            reason = 'churn'
+        elif self.is_idle():
+            with self.bind.connect() as connection:
+                reason = get_due_reason(connection)
+        else:
+            reason = None
+        if reason is not None:
+            self.running = threading.Thread(
+                target=run_maintenance, args=(reason,), kwargs={'bind': self.bind}, name='maintenance', daemon=True
+            )
+            self.running.start()
+        return reason
+
+def main():
+    parser = argparse.ArgumentParser(description='Run SQLite maintenance on WorkoutApp.db.')
+    parser.add_argument('--if-due', action='store_true', help='only run if churn, free pages or time since the last run call for it')
+    parser.add_argument('--max-pages', type=int, help='free at most this many pages in the incremental vacuum')
+    args = parser.parse_args()
+    engine.echo = False
+    if args.if_due:
+        with engine.connect() as connection:
+            reason = get_due_reason(connection)
+        if reason is None:
+            print('maintenance is not due')
+            return 0
+    else:
+        reason = 'manual'
+    result = run_maintenance(reason, args.max_pages)
+    return 1 if 'error' in result else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Description: Database setup shared by the GUI and the command line. A new database is created and
+filled with the default categories, and existing WorkoutApp.db files are migrated. The database's
+PRAGMA user_version records how many migrations have run, so each one runs once, in order, inside a
+single transaction.
+"""
+
+from sqlalchemy import inspect, insert, text
+from db_utils import Base, engine, initialize_database, SCHEMA_VERSION
+from archive import initialize_archive, archived_set_metric
+from training_load import daily_load, fill_buckets
+from search import create_search_index
+from maintenance import maintenance_run
+from DAO import CategoryDAO, ExerciseDAO, ExerciseTypeDAO, MEASUREMENT_TYPES
+import models
+
+#check if it is the first run and print table names in database
+def is_first_run(session):
+    inspector = inspect(session.get_bind())
+    is_database_created = inspector.has_table('exercise') and inspector.has_table('category')
+    if not is_database_created:
+        initialize_database(session.get_bind())
+        APP_DEFAULT_VALUES = {'Chest':['Barbell Bench Press', 'Incline Barbell Bench Press', 'Machine fly', 'Cable_fly', 'Push ups'],
+                              'Back':['Barbell Row', 'Lat Pulldown', 'pull ups', 'Seated Cable Row', 'Back Extension Machine'],
+                              'Legs':['Barbell Squat', 'Barbell Deadlift', "Bulgarian Split Squat", 'Kettelbell lunges', 'Hamstring curls', 'Leg Extensions', 'Box Jumps'],
+                              'Biceps':['Dumbell Curl', 'Dumbell Hammer Curl', 'EZ bar Curl', 'EZ bar Preacher Curl', 'Cable Curls']}
+        for category_name, exercises in APP_DEFAULT_VALUES.items():
+            category_dao = CategoryDAO(session)
+            category = category_dao.create_category(name=category_name)
+            for exercise_name in exercises:
+                exercise_dao = ExerciseDAO(session)
+                exercise_obj = exercise_dao.create_exercise(name=exercise_name, category=category)
+                exercise_type_dao = ExerciseTypeDAO(session)
+                exercise_type_dao.create_exercise_type(metric_1= 0, metric_2= 0,metric_label_1='lbs', metric_label_2='reps', exercise=exercise_obj)
+
+
+def add_metric_tables(connection):
+    #Create the metric tables and copy the two legacy metric columns into them
+    Base.metadata.create_all(connection)
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_set_exercise_id ON "set" (exercise_id)')
+    for position, label_column, value_type in ((0, 'metric_label_1', 'float'), (1, 'metric_label_2', 'int')):
+        connection.exec_driver_sql(f'''
+            INSERT INTO exercise_metric (exercise_type_id, position, label, value_type)
+            SELECT t.id, {position}, t.{label_column}, '{value_type}' FROM type t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM exercise_metric m WHERE m.exercise_type_id = t.id AND m.position = {position}
+            )''')
+    for position, value_column in ((0, 'metric_1'), (1, 'metric_2')):
+        connection.exec_driver_sql(f'''
+            INSERT OR IGNORE INTO set_metric (set_id, position, value)
+            SELECT id, {position}, {value_column} FROM "set" WHERE {value_column} IS NOT NULL''')
+
+def add_daily_load(connection):
+    #Create the training load buckets, add_planned_sets fills them once the set table has its planned column
+    daily_load.create(connection, checkfirst=True)
+
+def add_program_tables(connection):
+    Base.metadata.create_all(connection, tables=[
+        models.SessionTemplate.__table__, models.TemplateExercise.__table__, models.Program.__table__, models.ProgramDay.__table__
+    ])
+
+def add_unique_workout_date(connection):
+    #Merge workouts that share a date into the first one, then let the database refuse new duplicates
+    first_workout = '(SELECT min(kept.id) FROM workout kept JOIN workout this ON this.date = kept.date WHERE this.id = workout_id)'
+    duplicates = '(SELECT id FROM workout WHERE id NOT IN (SELECT min(id) FROM workout GROUP BY date))'
+    connection.exec_driver_sql(f'UPDATE "set" SET workout_id = {first_workout} WHERE workout_id IN {duplicates}')
+    connection.exec_driver_sql(f'UPDATE workout_exercise SET workout_id = {first_workout} WHERE workout_id IN {duplicates}')
+    connection.exec_driver_sql(f'DELETE FROM workout WHERE id IN {duplicates}')
+    connection.exec_driver_sql('CREATE UNIQUE INDEX IF NOT EXISTS ix_workout_date ON workout (date)')
+
+def add_archived_set_metric(connection):
+    #Unpack the comma separated extra_metrics of archived sets into archived_set_metric, one row per metric
+    archived_set_metric.create(connection, checkfirst=True)
+    columns = [row[1] for row in connection.exec_driver_sql('PRAGMA archive.table_info(archived_set)')]
+    if 'extra_metrics' not in columns:
+        return
+    metric_rows = []
+    for set_id, metric_1, metric_2, extra_metrics in connection.exec_driver_sql(
+        'SELECT id, metric_1, metric_2, extra_metrics FROM archive.archived_set'
+    ):
+        values = [metric_1, metric_2] + ([float(value) for value in extra_metrics.split(',')] if extra_metrics else [])
+        metric_rows += [
+            {'set_id': set_id, 'position': position, 'value': value}
+            for position, value in enumerate(values) if value is not None
+        ]
+    if metric_rows:
+        connection.execute(insert(archived_set_metric).prefix_with('OR IGNORE'), metric_rows)
+    connection.exec_driver_sql('ALTER TABLE archive.archived_set DROP COLUMN extra_metrics')
+
+def add_maintenance_error(connection):
+    #Failed maintenance runs are recorded with their error
+    maintenance_run.create(connection, checkfirst=True)
+    columns = [row[1] for row in connection.exec_driver_sql('PRAGMA main.table_info(maintenance_run)')]
+    if 'error' not in columns:
+        connection.exec_driver_sql('ALTER TABLE maintenance_run ADD COLUMN error VARCHAR')
+
+def fix_metric_value_types(connection):
+    #add_metric_tables made every second metric an int, time in minutes is not
+    for metrics in MEASUREMENT_TYPES.values():
+        for position, (label, value_type) in enumerate(metrics):
+            connection.execute(
+                text('UPDATE exercise_metric SET value_type = :value_type WHERE position = :position AND label = :label'),
+                {'value_type': value_type, 'position': position, 'label': label}
+            )
+
+def add_planned_sets(connection):
+    #Sets logged before programs had planned sets were all performed, then the buckets are rebuilt without planned sets
+    columns = [row[1] for row in connection.exec_driver_sql('PRAGMA main.table_info("set")')]
+    if 'planned' not in columns:
+        connection.exec_driver_sql('ALTER TABLE "set" ADD COLUMN planned BOOLEAN NOT NULL DEFAULT 0')
+    fill_buckets(connection)
+
+#Append new migrations to the end, never reorder them
+MIGRATIONS = [
+    add_metric_tables,
+    add_daily_load,
+    create_search_index,
+    add_program_tables,
+    add_unique_workout_date,
+    add_archived_set_metric,
+    add_maintenance_error,
+    fix_metric_value_types,
+    add_planned_sets,
+]
+assert len(MIGRATIONS) == SCHEMA_VERSION, 'set db_utils.SCHEMA_VERSION to the number of migrations'
+
+def migrate_database(bind=engine):
+    with bind.begin() as connection:
+        version = connection.exec_driver_sql('PRAGMA user_version').scalar()
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(connection)
+            connection.exec_driver_sql(f'PRAGMA user_version = {number}')
+
+def prepare_database(session):
+    #Works on whichever database the session is bound to, see tenants.py
+    is_first_run(session)
+    initialize_archive(session.get_bind())
+    migrate_database(session.get_bind())
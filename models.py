@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Date, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Date, Table, Boolean
+from sqlalchemy.orm import relationship, column_property
 from db_utils import Base
 
 
@@ -23,12 +23,43 @@ class ExerciseType(Base):
     #Define Foreign key for exercise id
     exercise_id = Column(Integer, ForeignKey('exercise.id'))  
 
-    #Define relationship with Exercise
+    #Define relationship with Exercise and the ordered metric definitions
     exercise = relationship('Exercise', back_populates='exercise_type')
+    metrics = relationship('ExerciseMetric', order_by='ExerciseMetric.position', cascade='all, delete-orphan', back_populates='exercise_type')
 
     def __repr__(self):
         return f'ExerciseType({self.id}, {self.metric_1} {self.metric_label_1}, {self.metric_2} {self.metric_label_2}, Exercise_id: {self.exercise_id})'
 
+#Define the ExerciseMetric class, one row per metric an exercise type tracks (weight, reps, RPE, ...)
+class ExerciseMetric(Base):
+    __tablename__ = 'exercise_metric'
+    id = Column(Integer, primary_key=True)
+    position = Column(Integer)
+    label = Column(String)
+    value_type = Column(String)
+
+    #Define Foreign key for exercise type id
+    exercise_type_id = Column(Integer, ForeignKey('type.id'))
+
+    #Define relationship with ExerciseType
+    exercise_type = relationship('ExerciseType', back_populates='metrics')
+
+    #Values are stored as floats, value_type ('float' or 'int') decides what is accepted and how it is shown
+    def parse_value(self, text):
+        try:
+            value = float(text)
+        except (TypeError, ValueError):
+            raise ValueError(f'{self.label} must be a number')
+        if self.value_type == 'int' and not value.is_integer():
+            raise ValueError(f'{self.label} must be a whole number')
+        return value
+
+    def format_value(self, value):
+        return f'{int(value)}' if self.value_type == 'int' else f'{value:g}'
+
+    def __repr__(self):
+        return f'ExerciseMetric({self.position}: {self.label} ({self.value_type}), ExerciseType_id: {self.exercise_type_id})'
+
 #Define the Exercise class
 class Exercise(Base):
     __tablename__ = 'exercise'
@@ -65,30 +96,113 @@ class Category(Base):
 class Set(Base):
     __tablename__ = 'set'
     id = Column(Integer, primary_key=True)
-    metric_1 = Column(Float)
-    metric_2 = Column(Integer)
+    #active_history loads the old value before an edit, training_load.py needs it for expired sets
+    metric_1 = column_property(Column(Float), active_history=True)
+    metric_2 = column_property(Column(Integer), active_history=True)
     timestamp = Column(String)
+    #Sets written by a program are planned until they are logged, planned sets are not training history
+    planned = column_property(Column(Boolean, nullable=False, default=False, server_default='0'), active_history=True)
 
     #Define Foreign Key for Exercise and Workout
-    exercise_id = Column(Integer, ForeignKey('exercise.id'))
+    exercise_id = Column(Integer, ForeignKey('exercise.id'), index=True)
     workout_id = Column(Integer, ForeignKey('workout.id'))
 
-    #Define relationship with workout and exercise
+    #Define relationship with workout, exercise and the metric values
     workout = relationship('Workout', back_populates= 'sets')
     exercise = relationship('Exercise',  back_populates='sets')
+    metric_values = relationship('SetMetric', order_by='SetMetric.position', cascade='all, delete-orphan', back_populates='set')
+
+    def get_metric_values(self):
+        return [metric.value for metric in self.metric_values]
+
+    def __repr__(self):
+        return f'Set(ID: {self.id}, timestamp: {self.timestamp}, metric_1: {self.metric_1}, metric_2: {self.metric_2}, exercise_name: {self.exercise.name if self.exercise is not None else None})'
+
+#Define the SetMetric class, a narrow (set, position, value) row without a rowid for each metric of a set
+class SetMetric(Base):
+    __tablename__ = 'set_metric'
+    __table_args__ = {'sqlite_with_rowid': False}
+    set_id = Column(Integer, ForeignKey('set.id'), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    value = Column(Float)
+
+    #Define relationship with set
+    set = relationship('Set', back_populates='metric_values')
 
     def __repr__(self):
-        return f'Set(ID: {self.id}, timestamp: {self.timestamp}, metric_1: {self.metric_1}, metric_2: {self.metric_2}, exercise_name: {self.exercise.name})'
+        return f'SetMetric(Set_id: {self.set_id}, position: {self.position}, value: {self.value})'
 
 #Define the Workout Class
 class Workout(Base):
     __tablename__ = 'workout'
     id = Column(Integer, primary_key=True)
-    date = Column(String)
+    date = Column(String, index=True, unique=True)
 
     #Define relationship with sets
     sets = relationship('Set', cascade= 'delete', back_populates= 'workout')
     exercises = relationship('Exercise', secondary= 'workout_exercise', back_populates= 'workouts')
 
     def __repr__(self):
-        return f'Workout(ID: {self.id}, date: {self.date}, exercises: {[exercise.name for exercise in self.exercises]})'
\ No newline at end of file
+        return f'Workout(ID: {self.id}, date: {self.date}, exercises: {[exercise.name for exercise in self.exercises]})'
+
+#Define the SessionTemplate class, a named session that can be planned on any date
+class SessionTemplate(Base):
+    __tablename__ = 'session_template'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+    #Define relationship with the planned exercises
+    exercises = relationship('TemplateExercise', order_by='TemplateExercise.position', cascade='all, delete-orphan', back_populates='template')
+
+    def __repr__(self):
+        return f'SessionTemplate(ID: {self.id}, Name: {self.name}, Exercises: {len(self.exercises)})'
+
+#Define the TemplateExercise class, one exercise of a template with its target sets
+class TemplateExercise(Base):
+    __tablename__ = 'template_exercise'
+    id = Column(Integer, primary_key=True)
+    position = Column(Integer)
+    target_sets = Column(Integer)
+    metric_1 = Column(Float)
+    metric_2 = Column(Integer)
+
+    #Define Foreign keys for the template and exercise
+    template_id = Column(Integer, ForeignKey('session_template.id'), index=True)
+    exercise_id = Column(Integer, ForeignKey('exercise.id'))
+
+    #Define relationships with SessionTemplate and Exercise
+    template = relationship('SessionTemplate', back_populates='exercises')
+    exercise = relationship('Exercise')
+
+    def __repr__(self):
+        return f'TemplateExercise({self.target_sets} x {self.metric_1}/{self.metric_2}, Exercise_id: {self.exercise_id})'
+
+#Define the Program class, a block of weeks with a session on some weekdays
+class Program(Base):
+    __tablename__ = 'program'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    weeks = Column(Integer)
+
+    #Define relationship with the program days
+    days = relationship('ProgramDay', order_by='ProgramDay.weekday', cascade='all, delete-orphan', back_populates='program')
+
+    def __repr__(self):
+        return f'Program(ID: {self.id}, Name: {self.name}, Weeks: {self.weeks}, Days: {[day.weekday for day in self.days]})'
+
+#Define the ProgramDay class, weekday is 0 for Monday through 6 for Sunday
+class ProgramDay(Base):
+    __tablename__ = 'program_day'
+    id = Column(Integer, primary_key=True)
+    weekday = Column(Integer)
+
+    #Define Foreign keys for the program and template
+    program_id = Column(Integer, ForeignKey('program.id'), index=True)
+    template_id = Column(Integer, ForeignKey('session_template.id'))
+
+    #Define relationships with Program and SessionTemplate
+    program = relationship('Program', back_populates='days')
+    template = relationship('SessionTemplate')
+
+    def __repr__(self):
+        return f'ProgramDay(Weekday: {self.weekday}, Program_id: {self.program_id}, Template_id: {self.template_id})'
@@ -0,0 +1,213 @@
+"""
+Description: Opt-in profiling for the Tk UI. Start the app with python main.py --profile (or set
+WORKOUT_PROFILE=1) and every page handler listed in HANDLERS is timed, with its time split into:
+db      - time SQLite spent executing statements and committing (engine cursor events and do_commit)
+orm     - time inside Session/Query calls and lazy loads that was not SQL, mostly building objects
+widget  - everything else, mostly creating and packing Tk widgets
+A heartbeat on the Tk event loop records every stall longer than STALL_THRESHOLD_MS along with the
+handler that ran last. Only the Tk thread is measured, background writers and maintenance are not.
+
+On exit three files are written to the profile directory:
+profile_handlers.csv  one row per handler, sorted by total time, open it in any spreadsheet to re-sort
+profile_stalls.csv    one row per event loop stall
+profile.folded        folded stacks (handler;child;phase microseconds) for flamegraph.pl or speedscope
+"""
+
+import csv
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session, Query
+
+#Page handlers to time, by class name in workout_UI
+HANDLERS = {
+    'WorkoutPage': ['is_new_workout', 'populate_exercises_sets', 'apply_pending'],
+    'CategoryPage': ['load_categories', 'run_search', 'apply_pending'],
+    'ExercisePage': ['load_exercises', 'apply_pending'],
+    'AddExercisePage': ['update_page', 'show_sets', 'save_new_set', 'apply_pending'],
+    'ProgressPage': ['show_exercise', 'draw', 'apply_pending']
+}
+
+#Entry points into the ORM, only the outermost call on the stack is timed
+ORM_METHODS = [
+    (Session, ['execute', 'scalar', 'scalars', 'get', 'flush', 'commit', 'refresh']),
+    (Query, ['all', 'first', 'one', 'one_or_none', 'scalar', 'count', '__iter__', 'get'])
+]
+
+HEARTBEAT_MS = 20
+STALL_THRESHOLD_MS = 100
+
+def is_tk_thread() ->bool:
+    return threading.current_thread() is threading.main_thread()
+
+class HandlerCall:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.orm = 0.0
+        self.children = 0.0
+
+class UIProfiler:
+    def __init__(self, engine, output_dir='.'):
+        self.engine = engine
+        self.output_dir = output_dir
+        self.stack = []
+        self.orm_depth = 0
+        self.db_total = 0.0
+        self.statement_started = []
+        self.last_handler = None
+        #Per handler name: [calls, total, max, db, orm, widget], times in seconds
+        self.handlers = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0, 0.0])
+        #Per stack path and phase: total seconds
+        self.folded = defaultdict(float)
+        self.stalls = []
+        self.last_beat = None
+        self.originals = []
+
+    def install(self, ui_module):
+        #Call before MyApp is built, so buttons bind to the timed handlers
+        event.listen(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+        # The COMMIT (and its fsync) does not go through a cursor
+        dialect = self.engine.dialect
+        self.original_commit = dialect.do_commit
+        def do_commit(dbapi_connection):
+            started = time.perf_counter()
+            try:
+                return self.original_commit(dbapi_connection)
+            finally:
+                self.add_db_time(time.perf_counter() - started)
+        dialect.do_commit = do_commit
+        for cls, method_names in ORM_METHODS:
+            for method_name in method_names:
+                self.wrap(cls, method_name, self.time_orm)
+        try:
+            from sqlalchemy.orm.strategies import LazyLoader
+            self.wrap(LazyLoader, '_load_for_state', self.time_orm)
+        except (ImportError, AttributeError):
+            pass
+        for class_name, method_names in HANDLERS.items():
+            page_class = getattr(ui_module, class_name)
+            for method_name in method_names:
+                self.wrap(page_class, method_name, functools.partial(self.time_handler, f'{class_name}.{method_name}'))
+
+    def uninstall(self):
+        for cls, method_name, original in reversed(self.originals):
+            setattr(cls, method_name, original)
+        self.originals = []
+        del self.engine.dialect.do_commit
+        event.remove(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.remove(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+
+    def wrap(self, cls, method_name, timer):
+        original = cls.__dict__.get(method_name)
+        if original is None:
+            return
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            return timer(original, *args, **kwargs)
+        setattr(cls, method_name, timed)
+        self.originals.append((cls, method_name, original))
+
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if is_tk_thread():
+            self.statement_started.append(time.perf_counter())
+
+    def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if is_tk_thread() and self.statement_started:
+            self.add_db_time(time.perf_counter() - self.statement_started.pop())
+
+    def add_db_time(self, elapsed):
+        if not is_tk_thread():
+            return
+        self.db_total += elapsed
+        if self.stack:
+            self.stack[-1].db += elapsed
+
+    def time_orm(self, original, *args, **kwargs):
+        if not is_tk_thread() or self.orm_depth:
+            return original(*args, **kwargs)
+        self.orm_depth = 1
+        started = time.perf_counter()
+        db_started = self.db_total
+        try:
+            return original(*args, **kwargs)
+        finally:
+            self.orm_depth = 0
+            #The SQL inside the call is already counted as db
+            orm_time = (time.perf_counter() - started) - (self.db_total - db_started)
+            if self.stack:
+                self.stack[-1].orm += max(orm_time, 0.0)
+
+    def time_handler(self, name, original, *args, **kwargs):
+        if not is_tk_thread():
+            return original(*args, **kwargs)
+        call = HandlerCall(name)
+        self.stack.append(call)
+        # An ORM call that is already running belongs to the caller, not to this handler
+        orm_depth, self.orm_depth = self.orm_depth, 0
+        try:
+            return original(*args, **kwargs)
+        finally:
+            self.orm_depth = orm_depth
+            self.stack.pop()
+            total = time.perf_counter() - call.started
+            widget = max(total - call.children - call.db - call.orm, 0.0)
+            if self.stack:
+                self.stack[-1].children += total
+            stats = self.handlers[name]
+            stats[0] += 1
+            stats[1] += total
+            stats[2] = max(stats[2], total)
+            stats[3] += call.db
+            stats[4] += call.orm
+            stats[5] += widget
+            path = ';'.join([frame.name for frame in self.stack] + [name])
+            self.folded[f'{path};db'] += call.db
+            self.folded[f'{path};orm'] += call.orm
+            self.folded[f'{path};widget'] += widget
+            self.last_handler = name
+
+    def watch_event_loop(self, app):
+        #A beat that arrives late means the event loop was blocked for the difference
+        self.last_beat = time.perf_counter()
+        def beat():
+            now = time.perf_counter()
+            late_ms = (now - self.last_beat) * 1000 - HEARTBEAT_MS
+            if late_ms >= STALL_THRESHOLD_MS:
+                self.stalls.append((time.strftime('%H:%M:%S'), round(late_ms, 1), self.last_handler or ''))
+            self.last_beat = now
+            app.after(HEARTBEAT_MS, beat)
+        app.after(HEARTBEAT_MS, beat)
+
+    def write_report(self) ->dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = {
+            'handlers': os.path.join(self.output_dir, 'profile_handlers.csv'),
+            'stalls': os.path.join(self.output_dir, 'profile_stalls.csv'),
+            'folded': os.path.join(self.output_dir, 'profile.folded')
+        }
+        rows = sorted(self.handlers.items(), key=lambda item: item[1][1], reverse=True)
+        with open(paths['handlers'], 'w', newline='') as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(['handler', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'db_ms', 'orm_ms', 'widget_ms'])
+            for name, (calls, total, longest, db, orm, widget) in rows:
+                writer.writerow([name, calls] + [round(value * 1000, 3) for value in (total, total / calls, longest, db, orm, widget)])
+        with open(paths['stalls'], 'w', newline='') as stalls_file:
+            writer = csv.writer(stalls_file)
+            writer.writerow(['time', 'stall_ms', 'last_handler'])
+            writer.writerows(self.stalls)
+        with open(paths['folded'], 'w') as folded_file:
+            for path, seconds in sorted(self.folded.items()):
+                if seconds > 0:
+                    folded_file.write(f'{path} {int(seconds * 1000000)}\n')
+
+        print(f"{'handler':<40}{'calls':>6}{'total ms':>11}{'db ms':>9}{'orm ms':>9}{'widget ms':>11}")
+        for name, (calls, total, longest, db, orm, widget) in rows:
+            print(f'{name:<40}{calls:>6}{total * 1000:>11.1f}{db * 1000:>9.1f}{orm * 1000:>9.1f}{widget * 1000:>11.1f}')
+        print(f"{len(self.stalls)} event loop stalls over {STALL_THRESHOLD_MS} ms, reports in {os.path.abspath(self.output_dir)}")
+        return paths
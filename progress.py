@@ -0,0 +1,90 @@
+"""
+Description: Progress series for the chart page. Set history rows are reduced to one point per
+day for the chosen measure, and long series are downsampled with Largest-Triangle-Three-Buckets
+so the canvas never draws more points than it has pixels.
+"""
+
+from datetime import date
+
+MEASURES = ('Metric 1', 'Volume', 'Estimated 1RM')
+
+def set_value(measure, metric_1, metric_2) ->float:
+    metric_1 = float(metric_1 or 0)
+    metric_2 = float(metric_2 or 0)
+    if measure == 'Volume':
+        return metric_1 * metric_2
+    if measure == 'Estimated 1RM':
+        # Epley formula, a single rep is already a max
+        return metric_1 if metric_2 <= 1 else metric_1 * (1 + metric_2 / 30)
+    return metric_1
+
+def day_number(workout_date) ->int:
+    return date.fromisoformat(workout_date).toordinal()
+
+class ProgressSeries:
+    #Keeps one value per day: the day's total for volume, the day's best set otherwise
+    def __init__(self, measure):
+        self.measure = measure
+        self.days = {}
+        self.points = []
+
+    def load(self, history_rows):
+        self.days.clear()
+        for row in history_rows:
+            self.combine(day_number(row.date), set_value(self.measure, row.metric_1, row.metric_2))
+        self.points = sorted(self.days.items())
+        return self.points
+
+    def combine(self, day, value):
+        if day not in self.days:
+            self.days[day] = value
+        elif self.measure == 'Volume':
+            self.days[day] += value
+        else:
+            self.days[day] = max(self.days[day], value)
+
+    def add_set(self, workout_date, metric_1, metric_2) ->bool:
+        #Returns True when only the newest point changed, so the chart can patch its last segment
+        day = day_number(workout_date)
+        is_newest = not self.points or day >= self.points[-1][0]
+        self.combine(day, set_value(self.measure, metric_1, metric_2))
+        if is_newest and self.points and self.points[-1][0] == day:
+            self.points[-1] = (day, self.days[day])
+        elif is_newest:
+            self.points.append((day, self.days[day]))
+        else:
+            self.points = sorted(self.days.items())
+        return is_newest
+
+def lttb(points, threshold):
+    #Largest-Triangle-Three-Buckets, keeps the first and last point and the most visually
+    #significant point of every bucket in between
+    if threshold < 3 or len(points) <= threshold:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third corner of the triangle
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, len(points))
+        next_bucket = points[next_start:next_end] or points[-1:]
+        avg_x = sum(point[0] for point in next_bucket) / len(next_bucket)
+        avg_y = sum(point[1] for point in next_bucket) / len(next_bucket)
+
+        anchor_x, anchor_y = points[selected]
+        largest_area = -1
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((anchor_x - avg_x) * (y - anchor_y) - (anchor_x - x) * (avg_y - anchor_y))
+            if area > largest_area:
+                largest_area = area
+                selected = index
+        sampled.append(points[selected])
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,173 @@
+"""
+Description: Weekly training reports for many WorkoutApp.db style files. Each report covers volume
+per category, sets per exercise, personal records and adherence for one week. Reports run in a
+process pool, every worker opens its own read-only engine, each report is written to the output
+directory as soon as it is done and a batch summary records throughput and per-report timing.
+
+To build reports for last week from the command line:
+python reports.py --output reports users/*/WorkoutApp.db
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from sqlalchemy import create_engine, event, func, select, union_all
+from sqlalchemy.orm import sessionmaker
+from db_utils import ARCHIVE_PATH
+from models import Exercise, Category, Workout, Set
+from archive import archived_set
+
+TARGET_DAYS_PER_WEEK = 4
+
+def get_week_start(day=None):
+    day = day or date.today()
+    return day - timedelta(days=day.weekday())
+
+def open_read_only(db_path):
+    #Every worker gets its own engine, mode=ro keeps a report from ever writing to a user's database.
+    #The WorkoutArchive.db next to it is attached read only too, so archived history counts
+    engine = create_engine(f'sqlite:///file:{os.path.abspath(db_path)}?mode=ro&uri=true')
+    archive_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_PATH)
+    has_archive = os.path.exists(archive_path)
+    if has_archive:
+        @event.listens_for(engine, 'connect')
+        def attach_archive(dbapi_connection, connection_record):
+            dbapi_connection.execute('ATTACH DATABASE ? AS archive', (f'file:{archive_path}?mode=ro',))
+    return engine, sessionmaker(bind=engine, info={'has_archive': has_archive})()
+
+def build_weekly_report(session, week_start, target_days=TARGET_DAYS_PER_WEEK) ->dict:
+    start = week_start.strftime('%Y-%m-%d')
+    end = (week_start + timedelta(days=6)).strftime('%Y-%m-%d')
+
+    # The week's performed sets, hot and archived, so a week past the archive horizon still gets a full report
+    week_sets = select(
+        Set.exercise_id.label('exercise_id'), Workout.date.label('day'), Set.metric_1.label('metric_1'), Set.metric_2.label('metric_2')
+    ).join(Set.workout).where(Workout.date.between(start, end), Set.planned == False)
+    if session.info.get('has_archive'):
+        week_sets = union_all(week_sets, select(
+            archived_set.c.exercise_id, archived_set.c.workout_date, archived_set.c.metric_1, archived_set.c.metric_2
+        ).where(archived_set.c.workout_date.between(start, end)))
+    week_sets = week_sets.subquery()
+
+    volume_by_category = session.query(
+        Category.name, func.count(), func.coalesce(func.sum(week_sets.c.metric_1 * week_sets.c.metric_2), 0)
+    ).select_from(week_sets).join(Exercise, Exercise.id == week_sets.c.exercise_id).join(Exercise.category).group_by(Category.id).all()
+
+    sets_by_exercise = session.query(
+        Exercise.name, func.count()
+    ).select_from(week_sets).join(Exercise, Exercise.id == week_sets.c.exercise_id).group_by(Exercise.id).all()
+
+    # A record is a week best that beats everything logged before the week started
+    week_best = session.query(
+        week_sets.c.exercise_id.label('exercise_id'), func.max(week_sets.c.metric_1).label('best')
+    ).group_by(week_sets.c.exercise_id).subquery()
+    history = select(Set.exercise_id.label('exercise_id'), Set.metric_1.label('metric_1')).join(Set.workout).where(
+        Workout.date < start, Set.planned == False
+    )
+    if session.info.get('has_archive'):
+        history = union_all(history, select(archived_set.c.exercise_id, archived_set.c.metric_1).where(archived_set.c.workout_date < start))
+    history = history.subquery()
+    previous_best = session.query(
+        history.c.exercise_id.label('exercise_id'), func.max(history.c.metric_1).label('best')
+    ).group_by(history.c.exercise_id).subquery()
+    personal_records = session.query(
+        Exercise.name, week_best.c.best, previous_best.c.best
+    ).join(week_best, week_best.c.exercise_id == Exercise.id).outerjoin(
+        previous_best, previous_best.c.exercise_id == Exercise.id
+    ).filter((previous_best.c.best == None) | (week_best.c.best > previous_best.c.best)).all()
+
+    training_days = session.query(func.count(func.distinct(week_sets.c.day))).scalar()
+
+    return {
+        'week_start': start,
+        'week_end': end,
+        'volume_by_category': [
+            {'category': name, 'sets': sets, 'volume': volume} for name, sets, volume in volume_by_category
+        ],
+        'sets_by_exercise': [{'exercise': name, 'sets': sets} for name, sets in sets_by_exercise],
+        'personal_records': [
+            {'exercise': name, 'best': best, 'previous_best': previous} for name, best, previous in personal_records
+        ],
+        'adherence': {
+            'training_days': training_days,
+            'target_days': target_days,
+            'ratio': round(min(training_days / target_days, 1.0), 3) if target_days else None
+        }
+    }
+
+def get_report_path(db_path, output_dir, week_start):
+    # Most users have a WorkoutApp.db of their own, the folder name keeps the files apart
+    folder = os.path.basename(os.path.dirname(os.path.abspath(db_path)))
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(output_dir, f'{folder}_{name}_{week_start:%Y-%m-%d}.json')
+
+def run_report(db_path, output_dir, week_start, target_days=TARGET_DAYS_PER_WEEK) ->dict:
+    #Worker entry point, writes its own report file and returns the timing for the summary
+    started = time.perf_counter()
+    engine, session = open_read_only(db_path)
+    try:
+        report = build_weekly_report(session, week_start, target_days)
+        report['database'] = os.path.abspath(db_path)
+        report_path = get_report_path(db_path, output_dir, week_start)
+        with open(report_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    finally:
+        session.close()
+        engine.dispose()
+    return {'database': db_path, 'report': report_path, 'seconds': round(time.perf_counter() - started, 4)}
+
+def run_batch(db_paths, output_dir, week_start=None, workers=None, target_days=TARGET_DAYS_PER_WEEK) ->dict:
+    week_start = week_start or get_week_start() - timedelta(days=7)
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    reports, failures = [], []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_report, db_path, output_dir, week_start, target_days): db_path for db_path in db_paths
+        }
+        # Collect results as they finish so one slow database does not hold up the rest
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                reports.append(result)
+                print(f"{result['seconds']:.3f}s  {result['report']}")
+            except Exception as error:
+                failures.append({'database': futures[future], 'error': repr(error)})
+                print(f'failed  {futures[future]}: {error!r}')
+
+    elapsed = time.perf_counter() - started
+    timings = sorted(report['seconds'] for report in reports)
+    summary = {
+        'week_start': week_start.strftime('%Y-%m-%d'),
+        'reports': len(reports),
+        'failures': failures,
+        'elapsed_seconds': round(elapsed, 4),
+        'reports_per_second': round(len(reports) / elapsed, 2) if elapsed else None,
+        'slowest_seconds': timings[-1] if timings else None,
+        'median_seconds': timings[len(timings) // 2] if timings else None,
+        'timings': sorted(reports, key=lambda report: report['seconds'], reverse=True)
+    }
+    with open(os.path.join(output_dir, 'batch_summary.json'), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Build weekly training reports for many workout databases.')
+    parser.add_argument('databases', nargs='+', help='WorkoutApp.db style files')
+    parser.add_argument('--output', default='reports', help='directory the reports are written to')
+    parser.add_argument('--week', type=date.fromisoformat, help='any day of the week to report, defaults to last week')
+    parser.add_argument('--workers', type=int, help='number of worker processes, defaults to the CPU count')
+    parser.add_argument('--target-days', type=int, default=TARGET_DAYS_PER_WEEK, help='training days planned per week')
+    args = parser.parse_args()
+
+    week_start = get_week_start(args.week) if args.week else None
+    summary = run_batch(args.databases, args.output, week_start, args.workers, args.target_days)
+    print(f"{summary['reports']} reports in {summary['elapsed_seconds']}s "
+          f"({summary['reports_per_second']} per second), {len(summary['failures'])} failed")
+
+if __name__ == '__main__':
+    main()
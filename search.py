@@ -0,0 +1,66 @@
+"""
+Description: Full text search over exercise and category names. exercise_search is an SQLite FTS5
+table with one row per exercise, keyed by the exercise id. Triggers on the exercise and category
+tables keep it in sync on every create, rename and delete, whichever code path makes the change.
+Searches match every word as a prefix and rank exercise name matches above category name matches.
+"""
+
+import re
+from sqlalchemy import text
+
+SEARCH_LIMIT = 25
+
+#Exercise name matches count ten times as much as category name matches
+RANK = 'bm25(exercise_search, 10.0, 1.0)'
+
+CREATE_SEARCH_INDEX = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS exercise_search USING fts5(
+        name, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS exercise_search_insert AFTER INSERT ON exercise BEGIN
+        INSERT INTO exercise_search (rowid, name, category)
+        VALUES (new.id, coalesce(new.name, ''), coalesce((SELECT name FROM category WHERE id = new.category_id), ''));
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS exercise_search_update AFTER UPDATE OF name, category_id ON exercise BEGIN
+        DELETE FROM exercise_search WHERE rowid = old.id;
+        INSERT INTO exercise_search (rowid, name, category)
+        VALUES (new.id, coalesce(new.name, ''), coalesce((SELECT name FROM category WHERE id = new.category_id), ''));
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS exercise_search_delete AFTER DELETE ON exercise BEGIN
+        DELETE FROM exercise_search WHERE rowid = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS category_search_update AFTER UPDATE OF name ON category BEGIN
+        UPDATE exercise_search SET category = coalesce(new.name, '')
+        WHERE rowid IN (SELECT id FROM exercise WHERE category_id = new.id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS category_search_delete AFTER DELETE ON category BEGIN
+        UPDATE exercise_search SET category = ''
+        WHERE rowid IN (SELECT id FROM exercise WHERE category_id = old.id);
+    END'''
+]
+
+def create_search_index(connection):
+    for statement in CREATE_SEARCH_INDEX:
+        connection.exec_driver_sql(statement)
+    rebuild_search_index(connection)
+
+def rebuild_search_index(connection):
+    #Refill the index from the exercise and category tables
+    connection.exec_driver_sql('DELETE FROM exercise_search')
+    connection.exec_driver_sql('''
+        INSERT INTO exercise_search (rowid, name, category)
+        SELECT e.id, coalesce(e.name, ''), coalesce(c.name, '')
+        FROM exercise e LEFT JOIN category c ON c.id = e.category_id''')
+
+def build_match_query(search_text):
+    #Every word has to match the start of a word, quoting keeps FTS5 syntax in the text from being parsed
+    words = re.findall(r'\w+', search_text.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_exercise_ids(session, search_text, limit=SEARCH_LIMIT) ->list:
+    match_query = build_match_query(search_text)
+    if not match_query:
+        return []
+    return session.execute(text(f'''
+        SELECT rowid FROM exercise_search WHERE exercise_search MATCH :query
+        ORDER BY {RANK}, name LIMIT :limit'''), {'query': match_query, 'limit': limit}).scalars().all()
@@ -0,0 +1,205 @@
+"""
+Description: Serve many users from one process. Every user id gets its own WorkoutApp.db and
+WorkoutArchive.db in a folder of its own (users/<id>/, the layout reports.py already reads), and
+the registry keeps an LRU-bounded set of open engines. A tenant's engine is created, and its
+database created or migrated, the first time it is used; once more than max_engines tenants are
+open the least recently used idle ones are disposed, so open files and memory stay bounded. A
+tenant with a session open is never evicted.
+
+with registry.dao_manager(user_id) as dao_manager:
+    dao_manager.get_instance(SetDAO).create_set(...)
+
+With shards set, users are spread over that many sub folders (users/shard_07/<id>/) so one folder
+does not end up holding every user. The event bus is shared by all tenants, so subscribers in a
+server should not assume every event comes from the same database. Training load windows and
+maintenance churn are kept per database; run_due_maintenance() runs SQLite maintenance for every
+open tenant that needs it, call it from the same periodic job as evict_idle().
+"""
+
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from db_utils import configure_connections
+from migrations import prepare_database
+from maintenance import track_churn, get_due_reason, run_maintenance
+from DAO import DAOManager
+
+MAX_ENGINES = 64
+CONNECTIONS_PER_TENANT = 2
+
+class TenantError(Exception):
+    pass
+
+class Tenant:
+    def __init__(self, user_id, engine):
+        self.user_id = user_id
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine)
+        self.active_sessions = 0
+        self.last_used = time.monotonic()
+
+class TenantRegistry:
+    def __init__(self, root_dir='users', max_engines=MAX_ENGINES, shards=0, connections_per_tenant=CONNECTIONS_PER_TENANT):
+        self.root_dir = root_dir
+        self.max_engines = max_engines
+        self.shards = shards
+        self.connections_per_tenant = connections_per_tenant
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per user while their database is opened, so two requests never migrate it twice
+        self._open_locks = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_tenant_dir(self, user_id):
+        user_id = str(user_id)
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', user_id):
+            raise TenantError(f'{user_id!r} is not a valid user id')
+        if self.shards:
+            shard = zlib.crc32(user_id.encode()) % self.shards
+            return os.path.join(self.root_dir, f'shard_{shard:02d}', user_id)
+        return os.path.join(self.root_dir, user_id)
+
+    def open_tenant(self, user_id):
+        tenant_dir = self.get_tenant_dir(user_id)
+        os.makedirs(tenant_dir, exist_ok=True)
+        database_path = os.path.abspath(os.path.join(tenant_dir, 'WorkoutApp.db'))
+        engine = create_engine(
+            f'sqlite:///{database_path}',
+            pool_size=self.connections_per_tenant,
+            max_overflow=0
+        )
+        configure_connections(engine, os.path.abspath(os.path.join(tenant_dir, 'WorkoutArchive.db')))
+        track_churn(engine)
+        tenant = Tenant(user_id, engine)
+        session = tenant.Session()
+        try:
+            prepare_database(session)
+        finally:
+            session.close()
+        return tenant
+
+    def acquire(self, user_id) ->Tenant:
+        #The tenant's engine, opened if needed, marked busy until release()
+        user_id = str(user_id)
+        with self._lock:
+            tenant = self._tenants.get(user_id)
+            if tenant is not None:
+                self._tenants.move_to_end(user_id)
+                tenant.active_sessions += 1
+                tenant.last_used = time.monotonic()
+                self._stats['hits'] += 1
+                return tenant
+            open_lock = self._open_locks.setdefault(user_id, threading.Lock())
+
+        # Opening can mean creating and migrating a database, other tenants should not wait for that
+        with open_lock:
+            with self._lock:
+                tenant = self._tenants.get(user_id)
+                if tenant is not None:
+                    self._tenants.move_to_end(user_id)
+                    tenant.active_sessions += 1
+                    self._stats['hits'] += 1
+                    return tenant
+            tenant = self.open_tenant(user_id)
+            with self._lock:
+                tenant.active_sessions += 1
+                self._tenants[user_id] = tenant
+                self._stats['misses'] += 1
+                self._open_locks.pop(user_id, None)
+                evicted = self._pop_cold_tenants()
+        for cold_tenant in evicted:
+            cold_tenant.engine.dispose()
+        return tenant
+
+    def release(self, tenant):
+        with self._lock:
+            tenant.active_sessions -= 1
+            tenant.last_used = time.monotonic()
+            evicted = self._pop_cold_tenants()
+        for cold_tenant in evicted:
+            cold_tenant.engine.dispose()
+
+    def _pop_cold_tenants(self):
+        # Oldest first, busy tenants are skipped and stay over the limit until they are released
+        evicted = []
+        for user_id in list(self._tenants):
+            if len(self._tenants) <= self.max_engines:
+                break
+            if self._tenants[user_id].active_sessions == 0:
+                evicted.append(self._tenants.pop(user_id))
+        self._stats['evictions'] += len(evicted)
+        return evicted
+
+    @contextmanager
+    def session_scope(self, user_id):
+        #A session on the user's own database, closed when the block ends
+        tenant = self.acquire(user_id)
+        session = tenant.Session()
+        try:
+            yield session
+        finally:
+            session.close()
+            self.release(tenant)
+
+    @contextmanager
+    def dao_manager(self, user_id):
+        with self.session_scope(user_id) as session:
+            yield DAOManager(session)
+
+    def evict_idle(self, idle_seconds) ->int:
+        #Close every idle tenant not used for idle_seconds, for a periodic clean up in a server
+        cutoff = time.monotonic() - idle_seconds
+        with self._lock:
+            cold = [
+                user_id for user_id, tenant in self._tenants.items()
+                if tenant.active_sessions == 0 and tenant.last_used < cutoff
+            ]
+            evicted = [self._tenants.pop(user_id) for user_id in cold]
+            self._stats['evictions'] += len(evicted)
+        for tenant in evicted:
+            tenant.engine.dispose()
+        return len(evicted)
+
+    def run_due_maintenance(self) ->dict:
+        #Run maintenance on every open tenant that is due, returns the results by user id
+        with self._lock:
+            tenants = list(self._tenants.values())
+            # Held like a session, so a tenant is not disposed while its maintenance runs
+            for tenant in tenants:
+                tenant.active_sessions += 1
+        results = {}
+        try:
+            for tenant in tenants:
+                with tenant.engine.connect() as connection:
+                    reason = get_due_reason(connection)
+                if reason is not None:
+                    results[tenant.user_id] = run_maintenance(reason, bind=tenant.engine)
+        finally:
+            # Not release(), maintenance is not use and should not keep an idle tenant open
+            with self._lock:
+                for tenant in tenants:
+                    tenant.active_sessions -= 1
+                evicted = self._pop_cold_tenants()
+            for cold_tenant in evicted:
+                cold_tenant.engine.dispose()
+        return results
+
+    def close(self):
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            tenant.engine.dispose()
+
+    def get_stats(self) ->dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_engines'] = len(self._tenants)
+            stats['busy_tenants'] = sum(1 for tenant in self._tenants.values() if tenant.active_sessions)
+        return stats
@@ -0,0 +1,105 @@
+"""
+Description: Hammers the DAOs from several threads at once, every thread gets its session from
+get_session() and works through its own DAOManager, the way background jobs do. It runs against a
+scratch database in a temporary folder, WorkoutApp.db is never touched.
+
+python -m unittest test_concurrency
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from sqlalchemy import create_engine, func, select
+from db_utils import ScopedSession, configure_connections, engine, get_session, remove_session
+from migrations import prepare_database
+from DAO import DAOManager, CategoryDAO, ExerciseDAO, SetDAO, WorkoutDAO
+from models import Workout, Set
+
+THREADS = 8
+ROUNDS = 20
+DATES = ['2024-01-01', '2024-01-02', '2024-01-03']
+
+class DAOConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.scratch_dir, 'WorkoutApp.db')}")
+        configure_connections(self.engine, os.path.join(self.scratch_dir, 'WorkoutArchive.db'))
+        remove_session()
+        ScopedSession.configure(bind=self.engine)
+        session = get_session()
+        prepare_database(session)
+        remove_session()
+
+    def tearDown(self):
+        remove_session()
+        ScopedSession.configure(bind=engine)
+        self.engine.dispose()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def run_threads(self, target):
+        # All threads start together so they race on the same rows
+        barrier = threading.Barrier(THREADS)
+        errors = []
+        def run(number):
+            try:
+                barrier.wait()
+                target(number)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                remove_session()
+        threads = [threading.Thread(target=run, args=(number,)) for number in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_sets_from_many_threads(self):
+        def log_sets(number):
+            dao_manager = DAOManager(get_session())
+            workout_dao: WorkoutDAO = dao_manager.get_instance(WorkoutDAO)
+            set_dao: SetDAO = dao_manager.get_instance(SetDAO)
+            exercise = dao_manager.get_instance(ExerciseDAO).get_all()[0]
+            for round_number in range(ROUNDS):
+                workout_date = DATES[round_number % len(DATES)]
+                workout = workout_dao.get_or_add_workout(workout_date)
+                new_set = set_dao.create_set(100 + number, round_number, '2024-01-01 10:00:00', workout, exercise)
+                if round_number % 4 == 3:
+                    set_dao.delete_set(new_set)
+        self.run_threads(log_sets)
+
+        session = get_session()
+        workouts = session.execute(select(Workout.date, func.count()).group_by(Workout.date)).all()
+        self.assertEqual(sorted(workouts), [(workout_date, 1) for workout_date in DATES])
+        self.assertEqual(session.scalar(select(func.count()).select_from(Set)), THREADS * (ROUNDS - ROUNDS // 4))
+        for workout_date in DATES:
+            self.assertIsNotNone(DAOManager(session).get_instance(WorkoutDAO).get_workout_by_date(workout_date))
+
+    def test_create_workout_race(self):
+        created = []
+        def create_workout(number):
+            workout = DAOManager(get_session()).get_instance(WorkoutDAO).create_workout(DATES[0])
+            created.append(workout.id)
+        self.run_threads(create_workout)
+
+        session = get_session()
+        self.assertEqual(session.scalar(select(func.count()).select_from(Workout).where(Workout.date == DATES[0])), 1)
+        self.assertEqual(set(created), {session.scalar(select(Workout.id).where(Workout.date == DATES[0]))})
+
+    def test_categories_from_many_threads(self):
+        def add_categories(number):
+            category_dao: CategoryDAO = DAOManager(get_session()).get_instance(CategoryDAO)
+            for round_number in range(ROUNDS):
+                category = category_dao.create_category(f'Category {number} {round_number}')
+                if round_number % 2:
+                    category_dao.delete_category(category)
+        self.run_threads(add_categories)
+
+        categories = DAOManager(get_session()).get_instance(CategoryDAO).get_all()
+        self.assertEqual(len([category for category in categories if category.name.startswith('Category ')]), THREADS * ROUNDS // 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,281 @@
+"""
+Description: Training load time series. Set volume (metric_1 x metric_2) is kept in per-day, per-category
+buckets in the daily_load table. Session flush events keep the buckets current whenever a Set is
+added, changed or deleted through the ORM (SetDAO, cascades, the write queue), inside the same
+transaction as the write. An in-memory TrainingLoad holds the 7 day (acute) and 28 day (chronic)
+rolling sums for every day, so a change only touches the days in its windows and the load for any
+date is a dictionary lookup. Archived sets stay in the buckets, restoring them does not count twice.
+Planned sets (see ProgramDAO.materialize_program) stay out of the buckets until they are logged.
+Every database (the app's own and each tenant's, see tenants.py) has its own TrainingLoad, looked up
+by the engine a session is bound to:
+
+get_training_load(session.get_bind()).get_load('2023-08-14')
+"""
+
+import threading
+import weakref
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import Table, Column, Integer, Float, String, event, inspect, select, func, union_all, text
+from sqlalchemy.orm import Session
+from db_utils import Base
+from models import Workout, Exercise, Set
+from archive import archived_set
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+#Define the daily_load table, one row per day and category
+daily_load = Table(
+    'daily_load',
+    Base.metadata,
+    Column('day', String, primary_key=True),
+    Column('category_id', Integer, primary_key=True),
+    Column('volume', Float),
+    Column('sets', Integer)
+)
+
+def set_volume(metric_1, metric_2) ->float:
+    try:
+        return float(metric_1 or 0) * float(metric_2 or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def to_day(value) ->int:
+    return date.fromisoformat(value).toordinal() if isinstance(value, str) else value.toordinal()
+
+class TrainingLoad:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.daily_volume = defaultdict(float)
+        self.daily_sets = defaultdict(int)
+        self.acute = defaultdict(float)
+        self.chronic = defaultdict(float)
+        self.weekly_tonnage = defaultdict(float)
+        self.loaded = False
+
+    def load(self, session):
+        #Rebuild the rolling windows from the buckets with one sliding pass over the days
+        rows = session.execute(select(daily_load)).all()
+        with self._lock:
+            self.clear()
+            for row in rows:
+                day = to_day(row.day)
+                self.daily_volume[day] += row.volume
+                self.daily_sets[day] += row.sets
+                self.weekly_tonnage[(day - date.fromordinal(day).weekday(), row.category_id)] += row.volume
+            if self.daily_volume:
+                acute_sum = chronic_sum = 0.0
+                first_day = min(self.daily_volume)
+                for day in range(first_day, max(self.daily_volume) + CHRONIC_DAYS):
+                    volume = self.daily_volume.get(day, 0.0)
+                    acute_sum += volume - self.daily_volume.get(day - ACUTE_DAYS, 0.0)
+                    chronic_sum += volume - self.daily_volume.get(day - CHRONIC_DAYS, 0.0)
+                    if acute_sum:
+                        self.acute[day] = acute_sum
+                    if chronic_sum:
+                        self.chronic[day] = chronic_sum
+            self.loaded = True
+
+    def apply(self, day, category_id, volume, sets):
+        # A change on one day only moves the windows that contain it
+        with self._lock:
+            if not self.loaded:
+                return
+            self.daily_volume[day] += volume
+            self.daily_sets[day] += sets
+            self.weekly_tonnage[(day - date.fromordinal(day).weekday(), category_id)] += volume
+            for offset in range(ACUTE_DAYS):
+                self.acute[day + offset] += volume
+            for offset in range(CHRONIC_DAYS):
+                self.chronic[day + offset] += volume
+
+    def get_load(self, for_date) ->dict:
+        day = to_day(for_date)
+        acute = self.acute.get(day, 0.0)
+        chronic = self.chronic.get(day, 0.0)
+        # Acute:chronic ratio compares the last week to the average week of the last four
+        weekly_chronic = chronic * ACUTE_DAYS / CHRONIC_DAYS
+        return {
+            'date': date.fromordinal(day).strftime('%Y-%m-%d'),
+            'volume': self.daily_volume.get(day, 0.0),
+            'sets': self.daily_sets.get(day, 0),
+            'acute': acute,
+            'chronic': chronic,
+            'acute_chronic_ratio': round(acute / weekly_chronic, 3) if weekly_chronic else None
+        }
+
+    def get_weekly_tonnage(self, for_date) ->dict:
+        day = to_day(for_date)
+        week_start = day - date.fromordinal(day).weekday()
+        with self._lock:
+            return {
+                category_id: volume for (week, category_id), volume in self.weekly_tonnage.items()
+                if week == week_start and volume
+            }
+
+    def get_streak(self, for_date) ->int:
+        #Consecutive training days ending on the date, walks back only as far as the streak goes
+        day = to_day(for_date)
+        streak = 0
+        while self.daily_sets.get(day - streak, 0) > 0:
+            streak += 1
+        return streak
+
+#One TrainingLoad per engine, filled by load() or backfill() and kept current by the flush hooks.
+#Held weakly, so a disposed tenant engine takes its windows with it.
+_training_loads = weakref.WeakKeyDictionary()
+_training_loads_lock = threading.Lock()
+
+def get_training_load(bind) ->TrainingLoad:
+    # A session bound to a connection still maps to the connection's engine
+    engine = bind.engine
+    with _training_loads_lock:
+        training_load = _training_loads.get(engine)
+        if training_load is None:
+            training_load = _training_loads[engine] = TrainingLoad()
+        return training_load
+
+def fill_buckets(connection):
+    #Rebuild every bucket from the performed hot sets and the archived sets with one grouped insert
+    hot = select(
+        Workout.date.label('day'),
+        func.coalesce(Exercise.category_id, 0).label('category_id'),
+        (func.coalesce(Set.metric_1, 0) * func.coalesce(Set.metric_2, 0)).label('volume')
+    ).select_from(Set).join(Set.workout).outerjoin(Set.exercise).where(Set.planned == False)
+    cold = select(
+        archived_set.c.workout_date.label('day'),
+        func.coalesce(Exercise.category_id, 0).label('category_id'),
+        (func.coalesce(archived_set.c.metric_1, 0) * func.coalesce(archived_set.c.metric_2, 0)).label('volume')
+    ).select_from(archived_set).outerjoin(Exercise, Exercise.id == archived_set.c.exercise_id)
+    history = union_all(hot, cold).subquery()
+
+    connection.execute(daily_load.delete())
+    connection.execute(daily_load.insert().from_select(
+        ['day', 'category_id', 'volume', 'sets'],
+        select(history.c.day, history.c.category_id, func.sum(history.c.volume), func.count())
+        .group_by(history.c.day, history.c.category_id)
+    ))
+
+def backfill(session):
+    #Full rebuild, for when the buckets are suspected to have drifted
+    fill_buckets(session)
+    session.commit()
+    get_training_load(session.get_bind()).load(session)
+
+def get_set_key(set_obj):
+    #Day and category a set counts towards
+    workout = set_obj.workout
+    exercise = set_obj.exercise
+    if workout is None or workout.date is None:
+        return None
+    return to_day(workout.date), (exercise.category_id if exercise is not None else None) or 0
+
+UPSERT_LOAD = text('''
+    INSERT INTO daily_load (day, category_id, volume, sets) VALUES (:day, :category_id, :volume, :sets)
+    ON CONFLICT (day, category_id) DO UPDATE SET
+        volume = volume + excluded.volume,
+        sets = sets + excluded.sets
+''')
+
+@event.listens_for(Session, 'before_flush')
+def track_set_changes(session, flush_context, instances):
+    if session.info.get('skip_training_load'):
+        return
+    deltas = defaultdict(lambda: [0.0, 0])
+    with session.no_autoflush:
+        for set_obj in session.new:
+            if isinstance(set_obj, Set) and not set_obj.planned:
+                key = get_set_key(set_obj)
+                if key is not None:
+                    deltas[key][0] += set_volume(set_obj.metric_1, set_obj.metric_2)
+                    deltas[key][1] += 1
+        for set_obj in session.deleted:
+            if isinstance(set_obj, Set) and not set_obj.planned:
+                key = get_set_key(set_obj)
+                if key is not None:
+                    deltas[key][0] -= set_volume(set_obj.metric_1, set_obj.metric_2)
+                    deltas[key][1] -= 1
+        for set_obj in session.dirty:
+            if isinstance(set_obj, Set):
+                history_1 = inspect(set_obj).attrs.metric_1.history
+                history_2 = inspect(set_obj).attrs.metric_2.history
+                history_planned = inspect(set_obj).attrs.planned.history
+                if not history_1.has_changes() and not history_2.has_changes() and not history_planned.has_changes():
+                    continue
+                old_1 = history_1.deleted[0] if history_1.deleted else set_obj.metric_1
+                old_2 = history_2.deleted[0] if history_2.deleted else set_obj.metric_2
+                was_planned = history_planned.deleted[0] if history_planned.deleted else set_obj.planned
+                # Logging a planned set adds the whole set, a planned set that stays planned counts for nothing
+                old_volume = 0.0 if was_planned else set_volume(old_1, old_2)
+                new_volume = 0.0 if set_obj.planned else set_volume(set_obj.metric_1, set_obj.metric_2)
+                key = get_set_key(set_obj)
+                if key is not None:
+                    deltas[key][0] += new_volume - old_volume
+                    deltas[key][1] += int(not set_obj.planned) - int(not was_planned)
+        for exercise in session.deleted:
+            if isinstance(exercise, Exercise) and exercise.category_id:
+                move_to_uncategorized(session, deltas, exercise.id, exercise.category_id)
+
+    changes = [(day, category_id, volume, sets) for (day, category_id), (volume, sets) in deltas.items() if volume or sets]
+    write_changes(session, changes)
+
+def move_to_uncategorized(session, deltas, exercise_id, category_id):
+    #The flush leaves a deleted exercise's sets without one, so their volume now counts under category 0,
+    #the bucket get_set_key and fill_buckets use for sets without an exercise
+    volume = func.coalesce(Set.metric_1, 0) * func.coalesce(Set.metric_2, 0)
+    hot = select(Workout.date.label('day'), volume.label('volume')).select_from(Set).join(Set.workout).where(
+        Set.exercise_id == exercise_id, Set.planned == False
+    )
+    cold = select(
+        archived_set.c.workout_date.label('day'),
+        (func.coalesce(archived_set.c.metric_1, 0) * func.coalesce(archived_set.c.metric_2, 0)).label('volume')
+    ).where(archived_set.c.exercise_id == exercise_id)
+    history = union_all(hot, cold).subquery()
+    for day, day_volume, sets in session.execute(
+        select(history.c.day, func.sum(history.c.volume), func.count()).group_by(history.c.day)
+    ):
+        deltas[(to_day(day), category_id)][0] -= day_volume
+        deltas[(to_day(day), category_id)][1] -= sets
+        deltas[(to_day(day), 0)][0] += day_volume
+        deltas[(to_day(day), 0)][1] += sets
+
+def write_changes(session, changes):
+    if not changes:
+        return
+    connection = session.connection()
+    for day, category_id, volume, sets in changes:
+        connection.execute(UPSERT_LOAD, {
+            'day': date.fromordinal(day).strftime('%Y-%m-%d'), 'category_id': category_id, 'volume': volume, 'sets': sets
+        })
+    # The in-memory windows only move once the transaction commits
+    session.info.setdefault('training_load_changes', []).extend(changes)
+
+def record_inserted_sets(session, condition):
+    #Core inserts skip the flush hooks, bulk writers pass a condition matching the sets they inserted.
+    #Planned sets among them are left out.
+    rows = session.execute(
+        select(
+            Workout.date, func.coalesce(Exercise.category_id, 0),
+            func.sum(func.coalesce(Set.metric_1, 0) * func.coalesce(Set.metric_2, 0)), func.count()
+        ).select_from(Set).join(Set.workout).outerjoin(Set.exercise).where(condition, Set.planned == False)
+        .group_by(Workout.date, func.coalesce(Exercise.category_id, 0))
+    ).all()
+    write_changes(session, [(to_day(day), category_id, volume, sets) for day, category_id, volume, sets in rows])
+
+@event.listens_for(Session, 'after_commit')
+def apply_committed_changes(session):
+    changes = session.info.pop('training_load_changes', [])
+    if not changes:
+        return
+    # The changes belong to the database this session wrote to, not to every open database
+    training_load = get_training_load(session.get_bind())
+    for change in changes:
+        training_load.apply(*change)
+
+@event.listens_for(Session, 'after_rollback')
+def drop_rolled_back_changes(session):
+    session.info.pop('training_load_changes', None)
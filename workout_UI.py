@@ -11,28 +11,38 @@ To run my program enter the following in the command line:
 python "main.py"
 """
 
-from DAO import ExerciseDAO, ExerciseTypeDAO, WorkoutDAO, SetDAO, CategoryDAO
+from DAO import ExerciseDAO, ExerciseTypeDAO, WorkoutDAO, SetDAO, CategoryDAO, DAOManager, MEASUREMENT_TYPES
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox  # Loads tk.messagebox
 from models import Category, ExerciseType, Exercise
 from datetime import date, datetime, timedelta  
-from db_utils import get_session
+from progress import MEASURES, ProgressSeries, lttb
+from events import event_bus, CREATED, UPDATED, DELETED
+from maintenance import MaintenanceScheduler
+from writer import WriteQueue
 
 
 LARGE_FONT= ("Helvetica", 12)
 LARGE_FONT_BOLD= ("Helvetica", 12, 'bold')
+SEARCH_DELAY_MS = 200
+MAINTENANCE_CHECK_MS = 30000
+
+#Text for one set, metrics past the first two are only loaded for exercise types that have them
+def format_set(set, exercise_type_obj):
+    metrics = exercise_type_obj.metrics
+    values = {0: set.metric_1, 1: set.metric_2}
+    if len(metrics) > 2:
+        values.update({metric_value.position: metric_value.value for metric_value in set.metric_values})
+    text = ''
+    for metric in metrics:
+        if values.get(metric.position) is not None:
+            text += f'\t{metric.format_value(values[metric.position])} {metric.label}'
+    if set.planned:
+        text += '\t(planned)'
+    return text
 
-class DAOManager:
-    _instances = {}
-    session = get_session()
-    def __init__(self, session) -> None:
-        self.session = session
-
-    def get_instance(self, dao_class):
-        if dao_class not in self._instances:
-            self._instances[dao_class] = dao_class(self.session)
-        return self._instances[dao_class]
-    
 #Create main window MyApp
 class MyApp(tk.Tk):
     def __init__(self, daoManager, *args, **kwargs):
@@ -50,10 +60,24 @@ class MyApp(tk.Tk):
         #DAO Manager
         self.dao_manager = daoManager
 
+        #Change events published on other threads (like the write queue) wait here for the Tk thread
+        self.pending_ui_events = queue.Queue()
+        self.after(50, self.poll_events)
+
+        #Every write from the pages goes through one write queue, close it when the app exits
+        self.write_queue = WriteQueue()
+
+        #Database maintenance waits until the user has stopped clicking and typing for a while
+        self.maintenance = MaintenanceScheduler()
+        self.bind_all('<Any-KeyPress>', self.maintenance.touch, add='+')
+        self.bind_all('<Any-ButtonPress>', self.maintenance.touch, add='+')
+        self.after(MAINTENANCE_CHECK_MS, self.check_maintenance)
+
         #Build Frames
         self.frames = {}
+        self.visible_frame = None
 
-        for F in (AddExercisePage, WorkoutPage, CategoryPage, ExercisePage,):
+        for F in (AddExercisePage, WorkoutPage, CategoryPage, ExercisePage, ProgressPage,):
             frame = F(frame_container, self, self.dao_manager)
             self.frames[F] = frame
             frame.grid(row=0, column=0, sticky="nsew")
@@ -66,11 +90,57 @@ class MyApp(tk.Tk):
 
     def show_frame(self, cont):
         frame = self.frames[cont]
+        self.visible_frame = frame
         frame.tkraise()# Bring the desired frame to the front
+        # Apply the change events the page collected while it was hidden
+        if hasattr(frame, 'on_show'):
+            frame.on_show()
     
     def get_frame_object(self, class_frame):
         return self.frames[class_frame]
 
+    def subscribe(self, entity, handler):
+        # Tk widgets may only be touched from the Tk thread
+        def ui_handler(event):
+            if threading.current_thread() is threading.main_thread():
+                handler(event)
+            else:
+                self.pending_ui_events.put((handler, event))
+        event_bus.subscribe(entity, ui_handler)
+
+    def watch_write(self, future, title):
+        #Queued writes finish on the writer thread, a failed one is reported on the Tk thread
+        def done(future):
+            if future.exception() is not None:
+                self.pending_ui_events.put((lambda error: tk.messagebox.showerror(title, str(error)), future.exception()))
+        future.add_done_callback(done)
+        return future
+
+    def wait_for_write(self, future):
+        #For the few writes a page cannot go on without, like the workout new sets are added to, the Tk
+        #thread waits for the writer to commit. The writer stays the only connection that writes.
+        result = future.result()
+        self.dao_manager.session.expire_all()
+        return result
+
+    def poll_events(self):
+        pending = []
+        while True:
+            try:
+                pending.append(self.pending_ui_events.get_nowait())
+            except queue.Empty:
+                break
+        if pending:
+            # The events come from commits on the writer's session, rows this session loaded before may be stale
+            self.dao_manager.session.expire_all()
+        for handler, event in pending:
+            handler(event)
+        self.after(50, self.poll_events)
+
+    def check_maintenance(self):
+        self.maintenance.check()
+        self.after(MAINTENANCE_CHECK_MS, self.check_maintenance)
+
 class WorkoutPage(tk.Frame):
     def __init__(self, parent, controller, dao_manager):
         tk.Frame.__init__(self, parent)
@@ -79,6 +149,17 @@ class WorkoutPage(tk.Frame):
         self.dao_manager = dao_manager
         self.selected_checkbuttons = []
 
+        #Exercise frames on screen keyed by exercise id, patched from set events
+        self.displayed_workout = None
+        self.archived_date = None
+        self.exercise_frames = {}
+        self.pending_exercise_ids = set()
+        self.needs_reload = False
+        self.selecting = False
+        self.controller.subscribe('set', self.on_set_changed)
+        self.controller.subscribe('exercise', self.on_catalog_changed)
+        self.controller.subscribe('category', self.on_catalog_changed)
+
         self.label = tk.Label(self, text="Workout Page", font=LARGE_FONT_BOLD)
         self.label.grid(row=0, column=0, columnspan=2, pady=10, padx=10)
 
@@ -107,7 +188,7 @@ class WorkoutPage(tk.Frame):
         self.new_workout_label.grid(row=0, column=0, padx=10, pady=50, sticky='ew')
 
         self.button = tk.Button(self, text="Add Exercise", font=LARGE_FONT_BOLD, width=20, height=3,
-                                command=lambda: self.controller.show_frame(CategoryPage))
+                                command=self.add_exercise)
         self.button.grid(row=11, column=0, columnspan=2, pady=10, padx=10, sticky="s")
 
         self.delete_select_btn = tk.Button(self, text="Delete/Select", font=LARGE_FONT_BOLD,
@@ -126,9 +207,15 @@ class WorkoutPage(tk.Frame):
         self.workout_doa: WorkoutDAO = self.dao_manager.get_instance(WorkoutDAO)
         self.workout_obj = self.workout_doa.get_workout_by_date(self.spinbox_value)
         self.add_exercise_page:AddExercisePage= self.controller.get_frame_object(AddExercisePage)
-        if self.workout_obj is None:
+        archived_sets = self.workout_doa.get_archived_sets_dict(self.spinbox_value) if self.workout_obj is None else {}
+        if archived_sets:
+            # Archived days are shown read only and only restored once they are edited
+            self.add_exercise_page.selected_workout = None
+            self.show_archived_workout(self.spinbox_value, archived_sets)
+        elif self.workout_obj is None:
             self.delete_select_btn.config(state='disabled')
-            self.current_workout = self.workout_doa.create_workout(date=self.spinbox_value)
+            workout_id = self.controller.wait_for_write(self.controller.write_queue.create_workout(self.spinbox_value))
+            self.current_workout = self.workout_doa.get_workout_by_id(workout_id)
             self.add_exercise_page.selected_workout = self.current_workout
             # self.new_workout_label = tk.Label(self.info_frame, text='No Exercises in this workout', font=LARGE_FONT)
             # self.new_workout_label.grid(row=0, column=0, padx=10, pady=50, sticky='ew' )
@@ -142,39 +229,147 @@ class WorkoutPage(tk.Frame):
     def populate_exercises_sets(self, workout_obj):
         for widget in self.info_frame.winfo_children():
             widget.destroy()
+        self.displayed_workout = workout_obj
+        self.archived_date = None
+        self.exercise_frames = {}
+        self.pending_exercise_ids.clear()
+        self.needs_reload = False
+        self.selecting = False
+        self.row = 0
         workout_dao: WorkoutDAO = self.dao_manager.get_instance(WorkoutDAO)
-        workout_sets = workout_dao.get_workout_sets(workout_obj)
-        print(workout_sets)
-        if workout_sets == []:
-            self.delete_select_btn.config(state='disabled')
-            self.new_workout_label = tk.Label(self.info_frame, text='No Exercises in this workout', font=LARGE_FONT)
-            self.new_workout_label.grid(row=0, column=0, padx=10, pady=50, sticky='ew')
-            pass
+        self.exercise_dict = self.sets_and_exercises(workout_dao, workout_obj)
+        if not self.exercise_dict:
+            self.show_empty_workout()
         else:
             self.delete_select_btn.config(state='active', command=self.create_selection)
-            self.exercise_dict = self.sets_and_exercises(workout_dao, workout_obj)
-            self.row = 0
             for key, value in self.exercise_dict.items():
-                self.exercise_frame = tk.LabelFrame(self.info_frame, text=f'{key.name}',font=LARGE_FONT_BOLD)
-                self.exercise_frame.grid(row = self.row, column=0, padx=5, pady=5, sticky='ew')
-                self.exercise_button = tk.Button(self.exercise_frame, text=value, font=LARGE_FONT, command = lambda exercise = key, workout = workout_obj: self.go_to_AddExercisePage(exercise, workout))
-                self.exercise_button.grid(row= self.row, column=0, padx=10, pady=5, sticky='ew')
-                self.row += 1
+                self.add_exercise_frame(key, value)
+
+    def show_archived_workout(self, workout_date, sets_dict):
+        for widget in self.info_frame.winfo_children():
+            widget.destroy()
+        self.displayed_workout = None
+        self.archived_date = workout_date
+        self.exercise_frames = {}
+        self.pending_exercise_ids.clear()
+        self.needs_reload = False
+        self.selecting = False
+        self.row = 0
+        self.delete_select_btn.config(state='active', command=self.create_selection)
+        for exercise, sets in sets_dict.items():
+            self.add_exercise_frame(exercise, self.format_sets(exercise.id, sets))
+
+    def restore_archived_workout(self):
+        #Editing an archived day moves it back into the hot database first
+        workout_dao: WorkoutDAO = self.dao_manager.get_instance(WorkoutDAO)
+        self.controller.wait_for_write(self.controller.write_queue.restore_workout(self.archived_date))
+        # Looked up by date, another writer may have restored the day first
+        workout = workout_dao.get_workout_by_date(self.archived_date)
+        self.controller.get_frame_object(AddExercisePage).selected_workout = workout
+        self.populate_exercises_sets(workout)
+        return workout
+
+    def add_exercise(self):
+        if self.archived_date is not None:
+            self.restore_archived_workout()
+        self.controller.show_frame(CategoryPage)
+
+    def show_empty_workout(self):
+        self.delete_select_btn.config(state='disabled')
+        self.new_workout_label = tk.Label(self.info_frame, text='No Exercises in this workout', font=LARGE_FONT)
+        self.new_workout_label.grid(row=0, column=0, padx=10, pady=50, sticky='ew')
+
+    def add_exercise_frame(self, exercise, set_string):
+        self.exercise_frame = tk.LabelFrame(self.info_frame, text=f'{exercise.name}',font=LARGE_FONT_BOLD)
+        self.exercise_frame.grid(row = self.row, column=0, padx=5, pady=5, sticky='ew')
+        self.exercise_button = tk.Button(self.exercise_frame, text=set_string, font=LARGE_FONT, command = lambda exercise = exercise, workout = self.displayed_workout: self.go_to_AddExercisePage(exercise, workout))
+        self.exercise_button.grid(row= self.row, column=0, padx=10, pady=5, sticky='ew')
+        self.exercise_frames[exercise.id] = (self.exercise_frame, self.exercise_button)
+        self.row += 1
 
     def sets_and_exercises(self, workout_dao: WorkoutDAO, workout_obj):
         self.string_dict = {}
         self.workout_sets = workout_dao.get_workout_sets_dict(workout_obj)
         for key, value in self.workout_sets.items():
-            self.set_lyst = []
-            for set in value:
-                exercise_type_dao : ExerciseTypeDAO = self.dao_manager.get_instance(ExerciseTypeDAO)
-                exercise_type_obj = exercise_type_dao.get_exercise_type_by_exercise_id(key.id)
-                self.set_lyst.append(f'\t{set.metric_1} {exercise_type_obj.metric_label_1}\t{set.metric_2} {exercise_type_obj.metric_label_2}')
-            set_string = '\n'.join(self.set_lyst)
-            self.string_dict[key] = set_string
+            self.string_dict[key] = self.format_sets(key.id, value)
         return self.string_dict
+
+    def format_sets(self, exercise_id, sets):
+        exercise_type_dao : ExerciseTypeDAO = self.dao_manager.get_instance(ExerciseTypeDAO)
+        exercise_type_obj = exercise_type_dao.get_exercise_type_by_exercise_id(exercise_id)
+        self.set_lyst = []
+        for set in sets:
+            self.set_lyst.append(format_set(set, exercise_type_obj))
+        return '\n'.join(self.set_lyst)
+
+    def on_set_changed(self, event):
+        if self.displayed_workout is None or event.workout_id != self.displayed_workout.id:
+            return
+        self.pending_exercise_ids.add(event.exercise_id)
+        if self.controller.visible_frame is self:
+            self.apply_pending()
+
+    def on_catalog_changed(self, event):
+        # Deletes can cascade to any exercise on screen, renames only touch their own frame
+        if event.action == DELETED:
+            self.needs_reload = True
+        elif event.entity == 'exercise' and event.id in self.exercise_frames:
+            self.pending_exercise_ids.add(event.id)
+        else:
+            return
+        if self.controller.visible_frame is self:
+            self.apply_pending()
+
+    def on_show(self):
+        # Coming back to the page ends selection mode, the check boxes were built from the old sets
+        if self.selecting:
+            self.selected_checkbuttons.clear()
+            self.populate_exercises_sets(self.displayed_workout)
+            return
+        self.apply_pending()
+
+    def apply_pending(self):
+        # The selection view is rebuilt by populate_exercises_sets when it closes
+        if self.selecting:
+            return
+        if self.archived_date is not None:
+            # The read only archive view is rebuilt rather than patched
+            if self.needs_reload or self.pending_exercise_ids:
+                self.is_new_workout()
+            return
+        if self.displayed_workout is None:
+            return
+        if self.needs_reload:
+            self.populate_exercises_sets(self.displayed_workout)
+            return
+        for exercise_id in self.pending_exercise_ids:
+            self.refresh_exercise(exercise_id)
+        self.pending_exercise_ids.clear()
+
+    def refresh_exercise(self, exercise_id):
+        exercise_dao: ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
+        sets = exercise_dao.get_sets_for_workout_and_exercise(self.displayed_workout.id, exercise_id)
+        if exercise_id in self.exercise_frames:
+            exercise_frame, exercise_button = self.exercise_frames[exercise_id]
+            if not sets:
+                exercise_frame.destroy()
+                del self.exercise_frames[exercise_id]
+            else:
+                exercise_frame.config(text=f'{sets[0].exercise.name}')
+                exercise_button.config(text=self.format_sets(exercise_id, sets))
+        elif sets:
+            if not self.exercise_frames:
+                self.new_workout_label.destroy()
+            self.add_exercise_frame(sets[0].exercise, self.format_sets(exercise_id, sets))
+
+        if self.exercise_frames:
+            self.delete_select_btn.config(state='active', command=self.create_selection)
+        elif not self.new_workout_label.winfo_exists():
+            self.show_empty_workout()
      
     def go_to_AddExercisePage(self, exercise, workout):
+        if workout is None:
+            workout = self.restore_archived_workout()
         add_exercise_page: AddExercisePage= self.controller.get_frame_object(AddExercisePage)
         add_exercise_page.selected_exercise = exercise
         add_exercise_page.selected_workout = workout
@@ -182,6 +377,10 @@ class WorkoutPage(tk.Frame):
         self.controller.show_frame(AddExercisePage)
     
     def create_selection(self):
+        if self.archived_date is not None:
+            self.restore_archived_workout()
+        self.selecting = True
+        self.exercise_frames = {}
         self.delete_select_btn.config(state='active', command=lambda: self.delete_selected_exercises())
         for widget in self.info_frame.winfo_children():
             widget.destroy()
@@ -192,11 +391,10 @@ class WorkoutPage(tk.Frame):
         spinbox_value = self.date_spinbox.get()
         workout_dao: WorkoutDAO = self.dao_manager.get_instance(WorkoutDAO)
         workout_obj = workout_dao.get_workout_by_date(spinbox_value)
-        workout_sets = workout_dao.get_workout_sets(workout_obj)
-        if workout_sets == []:
+        self.sets_and_exercises_dict = self.sets_and_exercises(workout_dao, workout_obj)
+        if not self.sets_and_exercises_dict:
             self.is_new_workout()
         else:
-            self.sets_and_exercises_dict = self.sets_and_exercises(workout_dao, workout_obj)
             self.row=0
             for key, value in self.sets_and_exercises_dict.items():
                 self.check_var = tk.BooleanVar(value=False)  # Create a BooleanVar for each checkbutton
@@ -216,13 +414,15 @@ class WorkoutPage(tk.Frame):
 
 
     def delete_selected_exercises(self):
-        exercise_dao : ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
+        # The frames go once the set events arrive from the write queue
         spinbox_value = self.date_spinbox.get()
         workout_dao: WorkoutDAO = self.dao_manager.get_instance(WorkoutDAO)
         workout_obj = workout_dao.get_workout_by_date(spinbox_value)
         for exercise in self.selected_checkbuttons:
-            exercise_dao.delete_sets_in_workout(workout_obj.id, exercise.id)
-        
+            self.controller.watch_write(
+                self.controller.write_queue.delete_sets_in_workout(workout_obj.id, exercise.id), 'Could not delete the sets'
+            )
+        self.selected_checkbuttons.clear()
         self.populate_exercises_sets(workout_obj)
             
 
@@ -236,6 +436,12 @@ class CategoryPage(tk.Frame):
         self.current_categories = None
         self.selected_checkbuttons = []
 
+        #Category buttons keyed by category id, patched from category events
+        self.category_buttons = {}
+        self.pending_events = {}
+        self.selecting = False
+        self.controller.subscribe('category', self.on_category_changed)
+        self.controller.subscribe('exercise', self.refresh_search)
 
         self.page_label = tk.Label(self, text='Category Page', font=LARGE_FONT_BOLD)
         self.page_label.pack(padx=10, pady=10, side="top")
@@ -251,6 +457,18 @@ class CategoryPage(tk.Frame):
                            command=self.delete_select)
         self.delete_btn.grid(row=0, column= 2, pady=15, padx=10, )
 
+        #Search as you type, the query runs once typing pauses
+        self.search_job = None
+        self.search_frame = tk.Frame(self)
+        self.search_frame.pack(padx=10, pady=5, side="top")
+        self.search_label = tk.Label(self.search_frame, text='Search exercises:', font=LARGE_FONT)
+        self.search_label.grid(row=0, column=0, padx=5)
+        self.search_text = tk.StringVar()
+        self.search_text.trace_add('write', self.on_search_changed)
+        self.search_entry = tk.Entry(self.search_frame, textvariable=self.search_text, width=25, font=LARGE_FONT)
+        self.search_entry.grid(row=0, column=1, padx=5)
+        self.search_results_frame = tk.LabelFrame(self, text="Search Results", font=LARGE_FONT_BOLD)
+
         self.categories_frame = tk.LabelFrame(self, text="Categories", width=200 ,font=LARGE_FONT_BOLD)
         self.categories_frame.pack(pady=10, padx=15)
 
@@ -269,18 +487,88 @@ class CategoryPage(tk.Frame):
         for widget in self.categories_frame.winfo_children():
             widget.destroy()
 
-        # Set a fixed width and height for category buttons
-        button_width = 20
-        button_height = 1
-        
         # Create category buttons dynamically
         self.describe_action_lbl = tk.Label(self.categories_frame, text='Click on a category to see exercises', font=LARGE_FONT)
         self.describe_action_lbl.pack(padx=10, pady=10, side="top")
+        self.category_buttons = {}
+        self.pending_events.clear()
+        self.selecting = False
         for category in self.categories:
-            category_button = tk.Button(self.categories_frame, text=category.name,
-                                        width=button_width, height=button_height,
-                                         command=lambda c=category: self.category_button_clicked(c))
-            category_button.pack(padx=5, pady=5)
+            self.add_category_button(category)
+
+    def add_category_button(self, category):
+        # Set a fixed width and height for category buttons
+        category_button = tk.Button(self.categories_frame, text=category.name,
+                                    width=20, height=1,
+                                    command=lambda c=category: self.category_button_clicked(c))
+        category_button.pack(padx=5, pady=5)
+        self.category_buttons[category.id] = (category, category_button)
+
+    def on_search_changed(self, *args):
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, self.run_search)
+
+    def refresh_search(self, event=None):
+        # Renames and deletes change the results, but only a visible search needs to run again
+        if self.search_text.get().strip():
+            self.on_search_changed()
+
+    def run_search(self):
+        self.search_job = None
+        for widget in self.search_results_frame.winfo_children():
+            widget.destroy()
+        search_text = self.search_text.get()
+        if not search_text.strip():
+            self.search_results_frame.pack_forget()
+            return
+        exercise_dao: ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
+        exercises = exercise_dao.search_exercises(search_text)
+        if not exercises:
+            tk.Label(self.search_results_frame, text='No matching exercises', font=LARGE_FONT).pack(padx=5, pady=5)
+        for exercise in exercises:
+            category_name = exercise.category.name if exercise.category else ''
+            tk.Button(self.search_results_frame, text=f'{exercise.name} ({category_name})', width=30, height=1,
+                      command=lambda e=exercise: self.search_result_clicked(e)).pack(padx=5, pady=2)
+        self.search_results_frame.pack(pady=5, padx=15, before=self.categories_frame)
+
+    def search_result_clicked(self, exercise):
+        # Go straight to the exercise, no need to load its whole category
+        exercise_frame: ExercisePage = self.controller.get_frame_object(ExercisePage)
+        exercise_frame.exercise_button_clicked(exercise)
+
+    def on_category_changed(self, event):
+        # Only the latest event per category matters
+        self.pending_events[event.id] = event
+        self.refresh_search()
+        if self.controller.visible_frame is self:
+            self.apply_pending()
+
+    def on_show(self):
+        # Coming back to the page ends selection mode
+        if self.selecting:
+            self.selected_checkbuttons.clear()
+            self.end_selection()
+            return
+        self.apply_pending()
+
+    def apply_pending(self):
+        if self.selecting:
+            return
+        for category_id, event in self.pending_events.items():
+            if event.action == DELETED and category_id in self.category_buttons:
+                category, category_button = self.category_buttons.pop(category_id)
+                category_button.destroy()
+            elif event.action == UPDATED and category_id in self.category_buttons:
+                category, category_button = self.category_buttons[category_id]
+                category_button.config(text=category.name)
+            elif event.action == CREATED and category_id not in self.category_buttons:
+                category_dao: CategoryDAO = self.dao_manager.get_instance(CategoryDAO)
+                category = category_dao.get_category_by_id(category_id)
+                if category is not None:
+                    self.add_category_button(category)
+        self.pending_events.clear()
+        self.current_categories = [category for category, category_button in self.category_buttons.values()]
     
     def go_home(self):
         self.controller.show_frame(WorkoutPage)
@@ -297,11 +585,8 @@ class CategoryPage(tk.Frame):
         def save_category():
             new_category_name = new_category_entry.get()
             if new_category_name:
-                category_dao = self.dao_manager.get_instance(CategoryDAO)
-                category_dao.create_category(name = new_category_name)
-
-                # Update the category list and refresh the view
-                self.load_categories()
+                # The category event adds the new button to the view once the write queue commits it
+                self.controller.watch_write(self.controller.write_queue.create_category(new_category_name), 'Could not add the category')
 
                 new_window.destroy()
 
@@ -321,9 +606,14 @@ class CategoryPage(tk.Frame):
 
     def delete_select(self):
         self.delete_btn.config(text='Delete', command=self.delete_selected_categories)
-        for widget in self.categories_frame.winfo_children():
-            widget.destroy()
-        self.delete_label = tk.Label(self.categories_frame, 
+        # Hide the category buttons instead of destroying them so they can be shown again after the delete
+        self.selecting = True
+        self.describe_action_lbl.pack_forget()
+        for category, category_button in self.category_buttons.values():
+            category_button.pack_forget()
+        self.selection_frame = tk.Frame(self.categories_frame)
+        self.selection_frame.pack()
+        self.delete_label = tk.Label(self.selection_frame, 
                                      text='select the sets you would like to delete\nthen click delete again')
         self.delete_label.pack(padx=20, pady=10)
         if self.current_categories is not None:
@@ -331,7 +621,7 @@ class CategoryPage(tk.Frame):
                 
                 self.check_var = tk.BooleanVar(value=False)                
 
-                self.check_button = tk.Checkbutton(self.categories_frame, text= category.name, variable= self.check_var)
+                self.check_button = tk.Checkbutton(self.selection_frame, text= category.name, variable= self.check_var)
                 self.check_button.pack(padx=35, pady=5, anchor='w')
                 self.check_button.config(command=lambda c=category, v=self.check_var: self.checkbutton_clicked(c, v))
     
@@ -342,11 +632,20 @@ class CategoryPage(tk.Frame):
             self.selected_checkbuttons.remove(category_obj)
 
     def delete_selected_categories(self):
-        category_dao : CategoryDAO = self.dao_manager.get_instance(CategoryDAO)
+        # The buttons go once the category events arrive from the write queue
         for category in self.selected_checkbuttons:
-            category_dao.delete_category(category)
+            self.controller.watch_write(self.controller.write_queue.delete_category(category.id), 'Could not delete the category')
         self.selected_checkbuttons.clear()
-        self.load_categories()
+        self.end_selection()
+
+    def end_selection(self):
+        self.selecting = False
+        self.selection_frame.destroy()
+        self.delete_btn.config(text='Delete/Select', command=self.delete_select)
+        self.describe_action_lbl.pack(padx=10, pady=10, side="top")
+        for category, category_button in self.category_buttons.values():
+            category_button.pack(padx=5, pady=5)
+        self.apply_pending()
 
 class ExercisePage(tk.Frame):
     def __init__(self, parent, controller: MyApp, dao_manager: DAOManager):
@@ -359,6 +658,12 @@ class ExercisePage(tk.Frame):
         self.current_exercises = None
         self.selected_exercises = []
 
+        #Exercise buttons keyed by exercise id, patched from exercise events
+        self.exercise_buttons = {}
+        self.pending_events = {}
+        self.selecting = False
+        self.controller.subscribe('exercise', self.on_exercise_changed)
+
         self.page_label = tk.Label(self, text='Exercise Page', font=LARGE_FONT_BOLD)
         self.page_label.pack(padx=10, pady=10, side="top")
 
@@ -392,21 +697,60 @@ class ExercisePage(tk.Frame):
             exercise_dao : ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
             exercises = exercise_dao.get_exercise_by_category(self.selected_category)
             self.current_exercises = exercises
-            # Set a fixed width and height for category buttons
-            button_width = 20
-            button_height = 1
+            self.exercise_buttons = {}
+            self.pending_events.clear()
+            self.selecting = False
 
             # Create exercise buttons dynamically
             for exercise in exercises:
-                exercise_button = tk.Button(self.exercises_frame, text=exercise.name, 
-                                            width=button_width, height=button_height,
-                                            command=lambda e=exercise: self.exercise_button_clicked(e))
-                exercise_button.pack(padx=5, pady= 5)
+                self.add_exercise_button(exercise)
             
             self.home_btn = tk.Button(self, text="Home",  width= 25, height=3, font=LARGE_FONT_BOLD, command=self.home)
             self.home_btn.pack(padx=10 , pady=10, side="bottom")
 
 
+    def add_exercise_button(self, exercise):
+        # Set a fixed width and height for exercise buttons
+        exercise_button = tk.Button(self.exercises_frame, text=exercise.name, 
+                                    width=20, height=1,
+                                    command=lambda e=exercise: self.exercise_button_clicked(e))
+        exercise_button.pack(padx=5, pady= 5)
+        self.exercise_buttons[exercise.id] = (exercise, exercise_button)
+
+    def on_exercise_changed(self, event):
+        if self.selected_category is None or event.category_id != self.selected_category.id:
+            return
+        # Only the latest event per exercise matters
+        self.pending_events[event.id] = event
+        if self.controller.visible_frame is self:
+            self.apply_pending()
+
+    def on_show(self):
+        # Coming back to the page ends selection mode
+        if self.selecting:
+            self.selected_exercises.clear()
+            self.end_selection()
+            return
+        self.apply_pending()
+
+    def apply_pending(self):
+        if self.selecting:
+            return
+        for exercise_id, event in self.pending_events.items():
+            if event.action == DELETED and exercise_id in self.exercise_buttons:
+                exercise, exercise_button = self.exercise_buttons.pop(exercise_id)
+                exercise_button.destroy()
+            elif event.action == UPDATED and exercise_id in self.exercise_buttons:
+                exercise, exercise_button = self.exercise_buttons[exercise_id]
+                exercise_button.config(text=exercise.name)
+            elif event.action == CREATED and exercise_id not in self.exercise_buttons:
+                exercise_dao: ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
+                exercise = exercise_dao.get_exercise_by_id(exercise_id)
+                if exercise is not None:
+                    self.add_exercise_button(exercise)
+        self.pending_events.clear()
+        self.current_exercises = [exercise for exercise, exercise_button in self.exercise_buttons.values()]
+
     def exercise_button_clicked(self, exercise):
         # Create an instance of ExercisePage with the selected category
         self.add_sets_to_workout: AddExercisePage = self.controller.get_frame_object(AddExercisePage)
@@ -420,20 +764,13 @@ class ExercisePage(tk.Frame):
         def save_exercise():
             new_exercise_name = new_exercise_entry.get()
             measurement_type = measurement_combobox.get()  # Get the selected measurement type
-
-            exercise_type_dao : ExerciseTypeDAO = self.dao_manager.get_instance(ExerciseTypeDAO)
-            if new_exercise_name and measurement_type:
-                exercise_dao: ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
-                new_exercise = exercise_dao.create_exercise(name=new_exercise_name, category=self.selected_category)
-            if measurement_type == "Distance and Time":
-                exercise_type = exercise_type_dao.create_exercise_type(metric_1=0, metric_2=0, metric_label_1='mi', metric_label_2='mins', exercise=new_exercise)
-            else:
-                exercise_type = exercise_type_dao.create_exercise_type(metric_1=0, metric_2=0, metric_label_1='lbs', metric_label_2='reps', exercise=new_exercise)
-
-
-                # Update the exercise list and refresh the view
-            self.load_exercises()
-
+            if not new_exercise_name or not measurement_type:
+                return
+            metrics = MEASUREMENT_TYPES.get(measurement_type, MEASUREMENT_TYPES['Weight and Reps'])
+            # The exercise and its type are written together, the exercise event adds the new button to the view
+            self.controller.watch_write(
+                self.controller.write_queue.create_exercise(new_exercise_name, self.selected_category.id, metrics), 'Could not add the exercise'
+            )
             new_window.destroy()
 
         new_window = tk.Toplevel(self.parent)
@@ -453,7 +790,7 @@ class ExercisePage(tk.Frame):
         measurement_label.pack()
 
         # Create a Combobox for measurement type selection
-        measurement_combobox = ttk.Combobox(center_frame, values=["Distance and Time", "Weight and Reps"])
+        measurement_combobox = ttk.Combobox(center_frame, values=list(MEASUREMENT_TYPES))
         measurement_combobox.pack()
 
         save_button = tk.Button(center_frame, text="Save", command=save_exercise)
@@ -467,9 +804,13 @@ class ExercisePage(tk.Frame):
     
     def delete_select(self):
         self.delete_exercise_btn.config(text='Delete', command=self.delete_selected_exercises)
-        for widget in self.exercises_frame.winfo_children():
-            widget.destroy()
-        self.delete_label = tk.Label(self.exercises_frame, 
+        # Hide the exercise buttons instead of destroying them so they can be shown again after the delete
+        self.selecting = True
+        for exercise, exercise_button in self.exercise_buttons.values():
+            exercise_button.pack_forget()
+        self.selection_frame = tk.Frame(self.exercises_frame)
+        self.selection_frame.pack()
+        self.delete_label = tk.Label(self.selection_frame, 
                                      text='select the exercises you would like to delete\nthen click delete again')
         self.delete_label.pack(padx=20, pady=10)
         if self.current_exercises is not None:
@@ -477,7 +818,7 @@ class ExercisePage(tk.Frame):
                 
                 self.check_var = tk.BooleanVar(value=False)                
 
-                self.check_button = tk.Checkbutton(self.exercises_frame, text= exercise.name, variable= self.check_var)
+                self.check_button = tk.Checkbutton(self.selection_frame, text= exercise.name, variable= self.check_var)
                 self.check_button.pack(padx=35, pady=5, anchor='w')
                 self.check_button.config(command=lambda e=exercise, v=self.check_var: self.checkbutton_clicked(e, v))
     
@@ -488,11 +829,19 @@ class ExercisePage(tk.Frame):
             self.selected_exercises.remove(exercise_obj)
 
     def delete_selected_exercises(self):
-        exercise_dao : ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
+        # The buttons go once the exercise events arrive from the write queue
         for exercise in self.selected_exercises:
-            exercise_dao.delete_exercise(exercise)
+            self.controller.watch_write(self.controller.write_queue.delete_exercise(exercise.id), 'Could not delete the exercise')
         self.selected_exercises.clear()
-        self.load_exercises()
+        self.end_selection()
+
+    def end_selection(self):
+        self.selecting = False
+        self.selection_frame.destroy()
+        self.delete_exercise_btn.config(command=self.delete_select)
+        for exercise, exercise_button in self.exercise_buttons.values():
+            exercise_button.pack(padx=5, pady= 5)
+        self.apply_pending()
 
 class AddExercisePage(tk.Frame):
     def __init__(self, parent, controller, dao_manager):
@@ -505,6 +854,13 @@ class AddExercisePage(tk.Frame):
 
         self.selected_checkbuttons = []
 
+        #New sets for the selected exercise are appended from set events
+        self.no_sets_label = None
+        self.pending_set_ids = []
+        self.needs_reload = False
+        self.selecting = False
+        self.controller.subscribe('set', self.on_set_changed)
+
         self.metrics_label_frame = tk.LabelFrame(self, text='Metrics', font=LARGE_FONT_BOLD)
         self.metrics_label_frame.pack(padx=10, pady=10)
 
@@ -524,10 +880,20 @@ class AddExercisePage(tk.Frame):
 
         self.save_button = tk.Button(self.metrics_label_frame, text="Save Set", font=LARGE_FONT,
                             command=lambda: self.save_new_set())
-        self.save_button.grid(row=2, column=0, padx=10, pady=10)
+        self.save_button.grid(row=3, column=0, padx=10, pady=10)
 
         self.delete_set_button = tk.Button(self.metrics_label_frame, text='Delete/Select', font=LARGE_FONT, command=self.delete_select)
-        self.delete_set_button.grid(row = 2, column=1, columnspan=2, padx=10, pady=5)
+        self.delete_set_button.grid(row = 3, column=1, columnspan=2, padx=10, pady=5)
+
+        self.progress_button = tk.Button(self.metrics_label_frame, text='Progress', font=LARGE_FONT, command=self.show_progress)
+        self.progress_button.grid(row=4, column=0, columnspan=2, padx=10, pady=5)
+
+        #Entries for metrics past the first two, rebuilt for each exercise type
+        self.extra_metrics_frame = tk.Frame(self.metrics_label_frame)
+        self.extra_metrics_frame.grid(row=2, column=0, columnspan=2)
+        self.extra_metric_entries = []
+        self.extra_metrics = []
+        self.metrics = []
 
         self.exercise_sets_frame = tk.LabelFrame(self, text=f'Sets', font=LARGE_FONT_BOLD)
         self.exercise_sets_frame.pack(padx=5, pady=10)
@@ -538,6 +904,7 @@ class AddExercisePage(tk.Frame):
 
     def update_page(self):
         self.delete_set_button.config(text='Delete/Select', command=self.delete_select)
+        self.selecting = False
         if self.selected_exercise is None or self.selected_workout is None:
             if self.selected_exercise is None:
                 print("\n\n\n\n\n\nexercise\n\n\n\n\n\n")
@@ -550,51 +917,106 @@ class AddExercisePage(tk.Frame):
             exercise_type_obj:ExerciseType = exercise_type_dao.get_exercise_type_by_exercise_id(self.selected_exercise.id)
             self.metric_label_1.config(text=f'{exercise_type_obj.metric_label_1}')
             self.metric_label_2.config(text=f'{exercise_type_obj.metric_label_2}')
+            self.metrics = exercise_type_obj.metrics
+            self.show_extra_metrics(exercise_type_obj.metrics[2:])
 
             self.show_sets()
             print("\n\n\nupdated\n\n\n")
 
+    def show_extra_metrics(self, extra_metrics):
+        for widget in self.extra_metrics_frame.winfo_children():
+            widget.destroy()
+        self.extra_metric_entries = []
+        self.extra_metrics = extra_metrics
+        for row, metric in enumerate(extra_metrics):
+            metric_entry = tk.Entry(self.extra_metrics_frame, justify='center', font=LARGE_FONT)
+            metric_entry.grid(row=row, column=0, padx=10, pady=10)
+            metric_label = tk.Label(self.extra_metrics_frame, text=f'{metric.label}', font=LARGE_FONT)
+            metric_label.grid(row=row, column=1, padx=10, pady=10)
+            self.extra_metric_entries.append(metric_entry)
+
     def show_sets(self):
         exercise_dao: ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
         sets = exercise_dao.get_sets_for_workout_and_exercise(self.selected_workout.id, self.selected_exercise.id)
         for widget in self.exercise_sets_frame.winfo_children():
             widget.destroy()
+        self.pending_set_ids.clear()
+        self.needs_reload = False
         if sets == [] or sets == None:
             self.no_sets_label = tk.Label(self.exercise_sets_frame, text='Add a set to your workout', font= LARGE_FONT)
             self.no_sets_label.pack(padx=5, pady=5)
         else:
+            self.no_sets_label = None
             for set in sets:
-                exercise_type_dao : ExerciseTypeDAO = self.dao_manager.get_instance(ExerciseTypeDAO)
-                exercise_type_obj:ExerciseType = exercise_type_dao.get_exercise_type_by_exercise_id(self.selected_exercise.id)
-                self.set_button = tk.Button(self.exercise_sets_frame, text=f'\t{set.metric_1} {exercise_type_obj.metric_label_1}\t{set.metric_2} {exercise_type_obj.metric_label_2}')
-                self.set_button.pack(padx=50, pady=5)
+                self.add_set_button(set)
 
-    def save_new_set(self):
-        metric_1_value = self.metric_1_entry.get()
-        metric_2_value = self.metric_2_entry.get()
+    def add_set_button(self, set):
+        exercise_type_dao : ExerciseTypeDAO = self.dao_manager.get_instance(ExerciseTypeDAO)
+        exercise_type_obj:ExerciseType = exercise_type_dao.get_exercise_type_by_exercise_id(self.selected_exercise.id)
+        self.set_button = tk.Button(self.exercise_sets_frame, text=format_set(set, exercise_type_obj))
+        self.set_button.pack(padx=50, pady=5)
 
-        # Validate that the values can be converted to floats
-        try:
-            metric_1_value = float(metric_1_value)
-            metric_2_value = float(metric_2_value)
-        except ValueError:
-            error_message = "Invalid input. Please enter valid numeric values."
-            tk.messagebox.showerror("Input Error", error_message)
+    def on_set_changed(self, event):
+        if self.selected_workout is None or self.selected_exercise is None:
+            return
+        if event.workout_id != self.selected_workout.id or event.exercise_id != self.selected_exercise.id:
+            return
+        if event.action == CREATED:
+            self.pending_set_ids.append(event.id)
+        else:
+            self.needs_reload = True
+        if self.controller.visible_frame is self:
+            self.apply_pending()
+
+    def on_show(self):
+        self.apply_pending()
+
+    def apply_pending(self):
+        # The selection view is rebuilt by update_page when it closes
+        if self.selecting or self.selected_workout is None or self.selected_exercise is None:
+            return
+        if self.needs_reload:
+            self.show_sets()
             return
         set_dao: SetDAO = self.dao_manager.get_instance(SetDAO)
-        new_set = set_dao.create_set(
-            metric_1=self.metric_1_entry.get(), 
-            metric_2=self.metric_2_entry.get(), 
-            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
-            workout=self.selected_workout,
-            exercise=self.selected_exercise
-                                    )
-        self.show_sets()
-        return new_set
+        for set_id in self.pending_set_ids:
+            new_set = set_dao.get_set_by_id(set_id)
+            if new_set is None:
+                continue
+            if self.no_sets_label is not None:
+                self.no_sets_label.destroy()
+                self.no_sets_label = None
+            self.add_set_button(new_set)
+        self.pending_set_ids.clear()
+
+    def save_new_set(self):
+        # Validate every value against its metric's value_type
+        try:
+            metric_1_value = self.metrics[0].parse_value(self.metric_1_entry.get())
+            metric_2_value = self.metrics[1].parse_value(self.metric_2_entry.get())
+            extra_values = [metric.parse_value(entry.get()) if entry.get() else None for metric, entry in zip(self.extra_metrics, self.extra_metric_entries)]
+        except ValueError as error:
+            tk.messagebox.showerror("Input Error", f"Invalid input. {error}.")
+            return
+        # The set event adds the new set to the page once the write queue commits it
+        return self.controller.watch_write(self.controller.write_queue.create_set(
+            metric_1=metric_1_value,
+            metric_2=metric_2_value,
+            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            workout_id=self.selected_workout.id,
+            exercise_id=self.selected_exercise.id,
+            extra_values=extra_values
+        ), 'Could not save the set')
+
+    def show_progress(self):
+        if self.selected_exercise is None:
+            return
+        progress_page: ProgressPage = self.controller.get_frame_object(ProgressPage)
+        progress_page.show_exercise(self.selected_exercise)
+        self.controller.show_frame(ProgressPage)
     
     def home_screen(self):
-        workout_page_obj = self.controller.get_frame_object(WorkoutPage)
-        workout_page_obj.is_new_workout()
+        # WorkoutPage patches the changed exercises from the events it collected
         self.controller.show_frame(WorkoutPage)
     
     def validate_numeric_input(action, value_if_allowed):
@@ -607,6 +1029,7 @@ class AddExercisePage(tk.Frame):
 
     def delete_select(self):
         self.delete_set_button.config(text='Delete', command=lambda :self.delete_selected_sets())
+        self.selecting = True
         for widget in self.exercise_sets_frame.winfo_children():
             widget.destroy()
         self.delete_label = tk.Label(self.exercise_sets_frame, 
@@ -624,7 +1047,7 @@ class AddExercisePage(tk.Frame):
                 exercise_type_dao : ExerciseTypeDAO = self.dao_manager.get_instance(ExerciseTypeDAO)
                 exercise_type_obj:ExerciseType = exercise_type_dao.get_exercise_type_by_exercise_id(self.selected_exercise.id)
                 self.check_var = tk.BooleanVar(value=False)
-                self.checkbutton_text = f'\t{set.metric_1} {exercise_type_obj.metric_label_1}\t{set.metric_2} {exercise_type_obj.metric_label_2}'
+                self.checkbutton_text = format_set(set, exercise_type_obj)
                 
 
                 self.check_button = tk.Checkbutton(self.exercise_sets_frame, text= self.checkbutton_text, variable= self.check_var)
@@ -638,7 +1061,152 @@ class AddExercisePage(tk.Frame):
             self.selected_checkbuttons.remove(set_obj)
 
     def delete_selected_sets(self):
-        set_dao : SetDAO = self.dao_manager.get_instance(SetDAO)
+        # The set events update the page once the write queue commits the deletes
         for set in self.selected_checkbuttons:
-            set_dao.delete_set(set)
+            self.controller.watch_write(self.controller.write_queue.delete_set(set.id), 'Could not delete the set')
+        self.selected_checkbuttons.clear()
         self.update_page()
+
+class ProgressPage(tk.Frame):
+    CANVAS_WIDTH = 380
+    CANVAS_HEIGHT = 400
+    MARGIN = 40
+
+    def __init__(self, parent, controller, dao_manager):
+        tk.Frame.__init__(self, parent)
+        self.parent = parent
+        self.controller = controller
+        self.dao_manager = dao_manager
+        self.selected_exercise = None
+        self.series = None
+        self.drawn_coords = []
+        self.scale = None
+        self.pending_set_ids = []
+        self.needs_reload = False
+        self.controller.subscribe('set', self.on_set_changed)
+
+        self.page_label = tk.Label(self, text='Progress', font=LARGE_FONT_BOLD)
+        self.page_label.pack(padx=10, pady=10, side="top")
+
+        self.measure_combobox = ttk.Combobox(self, values=MEASURES, state='readonly', font=LARGE_FONT)
+        self.measure_combobox.set(MEASURES[0])
+        self.measure_combobox.bind('<<ComboboxSelected>>', lambda event: self.load_series())
+        self.measure_combobox.pack(padx=10, pady=5)
+
+        self.canvas = tk.Canvas(self, width=self.CANVAS_WIDTH, height=self.CANVAS_HEIGHT, bg='white')
+        self.canvas.pack(padx=10, pady=10)
+
+        self.back_button = tk.Button(self, text="Back", font=LARGE_FONT_BOLD, width=20, height=3,
+                                     command=lambda: self.controller.show_frame(AddExercisePage))
+        self.back_button.pack(padx=10, pady=10, side='bottom')
+
+    def show_exercise(self, exercise):
+        self.selected_exercise = exercise
+        self.page_label.config(text=f'{exercise.name} Progress')
+        self.load_series()
+
+    def load_series(self):
+        if self.selected_exercise is None:
+            return
+        exercise_dao: ExerciseDAO = self.dao_manager.get_instance(ExerciseDAO)
+        history = exercise_dao.get_exercise_history(self.selected_exercise)
+        self.series = ProgressSeries(self.measure_combobox.get())
+        self.series.load(history)
+        self.pending_set_ids.clear()
+        self.needs_reload = False
+        self.draw()
+
+    def on_set_changed(self, event):
+        if self.series is None or event.exercise_id != self.selected_exercise.id:
+            return
+        if event.action == CREATED:
+            self.pending_set_ids.append(event.id)
+        else:
+            self.needs_reload = True
+        if self.controller.visible_frame is self:
+            self.apply_pending()
+
+    def on_show(self):
+        self.apply_pending()
+
+    def apply_pending(self):
+        if self.needs_reload:
+            self.load_series()
+            return
+        set_dao: SetDAO = self.dao_manager.get_instance(SetDAO)
+        for set_id in self.pending_set_ids:
+            new_set = set_dao.get_set_by_id(set_id)
+            # Planned sets join the series when they are logged, that arrives as an update
+            if new_set is not None and not new_set.planned:
+                self.add_set(new_set.workout.date, new_set.metric_1, new_set.metric_2)
+        self.pending_set_ids.clear()
+
+    def add_set(self, workout_date, metric_1, metric_2):
+        #Keep the cached series current, only the newest segment is redrawn when it still fits the axes
+        only_newest = self.series.add_set(workout_date, metric_1, metric_2)
+        day, value = self.series.points[-1]
+        if only_newest and self.scale is not None and self.fits_scale(day, value):
+            self.patch_newest(day, value)
+        else:
+            self.draw()
+
+    def fits_scale(self, day, value):
+        first_day, last_day, low, high = self.scale
+        return first_day <= day <= last_day and low <= value <= high
+
+    def to_canvas(self, day, value):
+        first_day, last_day, low, high = self.scale
+        plot_width = self.CANVAS_WIDTH - 2 * self.MARGIN
+        plot_height = self.CANVAS_HEIGHT - 2 * self.MARGIN
+        x = self.MARGIN + (day - first_day) / max(last_day - first_day, 1) * plot_width
+        y = self.CANVAS_HEIGHT - self.MARGIN - (value - low) / max(high - low, 1) * plot_height
+        return x, y
+
+    def draw(self):
+        self.canvas.delete('all')
+        self.drawn_coords = []
+        self.scale = None
+        points = self.series.points if self.series is not None else []
+        if not points:
+            self.canvas.create_text(self.CANVAS_WIDTH / 2, self.CANVAS_HEIGHT / 2, text='No sets logged yet', font=LARGE_FONT)
+            return
+
+        # Axes run to today so sets logged today land inside the current scale
+        values = [value for day, value in points]
+        last_day = max(points[-1][0], date.today().toordinal())
+        self.scale = (points[0][0], last_day, min(values), max(values))
+
+        # Never draw more points than the plot has pixels
+        sampled = lttb(points, self.CANVAS_WIDTH - 2 * self.MARGIN)
+        self.drawn_coords = [self.to_canvas(day, value) for day, value in sampled]
+
+        bottom = self.CANVAS_HEIGHT - self.MARGIN
+        self.canvas.create_line(self.MARGIN, bottom, self.CANVAS_WIDTH - self.MARGIN, bottom)
+        self.canvas.create_line(self.MARGIN, self.MARGIN, self.MARGIN, bottom)
+        self.canvas.create_text(self.MARGIN, bottom + 15, text=date.fromordinal(self.scale[0]).strftime('%Y-%m-%d'), anchor='w')
+        self.canvas.create_text(self.CANVAS_WIDTH - self.MARGIN, bottom + 15, text=date.fromordinal(last_day).strftime('%Y-%m-%d'), anchor='e')
+        self.canvas.create_text(self.MARGIN - 5, bottom, text=f'{self.scale[2]:g}', anchor='e')
+        self.canvas.create_text(self.MARGIN - 5, self.MARGIN, text=f'{self.scale[3]:g}', anchor='e')
+
+        if len(self.drawn_coords) > 1:
+            self.canvas.create_line(*[c for coord in self.drawn_coords for c in coord], fill='blue', width=2, tags='series')
+        self.draw_marker()
+
+    def patch_newest(self, day, value):
+        newest = self.to_canvas(day, value)
+        if self.drawn_coords and abs(self.drawn_coords[-1][0] - newest[0]) < 0.5:
+            self.drawn_coords[-1] = newest
+        else:
+            self.drawn_coords.append(newest)
+        if len(self.drawn_coords) > 1:
+            flat = [c for coord in self.drawn_coords for c in coord]
+            if self.canvas.find_withtag('series'):
+                self.canvas.coords('series', *flat)
+            else:
+                self.canvas.create_line(*flat, fill='blue', width=2, tags='series')
+        self.draw_marker()
+
+    def draw_marker(self):
+        self.canvas.delete('newest')
+        x, y = self.drawn_coords[-1]
+        self.canvas.create_oval(x - 3, y - 3, x + 3, y + 3, fill='blue', outline='blue', tags='newest')
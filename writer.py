@@ -0,0 +1,212 @@
+"""
+Description: Single writer thread with group commit. Writes from the UI, imports or a server are
+queued instead of committing on the caller's thread. The writer takes every write that arrives
+within a short window and commits them as one transaction, so SQLite sees one writer and one
+fsync per batch instead of many competing "database is locked" commits. Each caller gets a Future
+that resolves after the batch holding its write is durable.
+
+Operations run on the writer's own session, so the helpers take and return ids rather than ORM
+objects from the caller's session.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy.orm import Session, sessionmaker
+from db_utils import engine
+from events import event_bus
+from models import Workout, Exercise, Category, Set
+from DAO import DAOManager, SetDAO, CategoryDAO, ExerciseDAO, ExerciseTypeDAO, WorkoutDAO
+
+GROUP_COMMIT_WINDOW = 0.005
+MAX_BATCH_SIZE = 500
+
+class GroupCommitSession(Session):
+    #While a batch runs the DAOs' commits only flush, the writer commits the batch once at the end
+    batching = False
+
+    def commit(self):
+        if self.batching:
+            self.flush()
+        else:
+            super().commit()
+
+def get_row(session, model, row_id):
+    row = session.get(model, row_id)
+    if row is None:
+        raise LookupError(f'{model.__name__} {row_id} does not exist')
+    return row
+
+class WriteQueue:
+    def __init__(self, window=GROUP_COMMIT_WINDOW, max_batch=MAX_BATCH_SIZE, session_factory=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.session_factory = session_factory or sessionmaker(bind=engine, class_=GroupCommitSession)
+        self._queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'batches': 0,
+            'writes': 0,
+            'failed_writes': 0,
+            'largest_batch': 0,
+            'deepest_queue': 0,
+            'last_batch_size': 0,
+            'last_commit_ms': 0.0
+        }
+        self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation) ->Future:
+        #operation(dao_manager) runs on the writer thread, the Future gets its return value after the commit
+        future = Future()
+        self._queue.put((operation, future))
+        with self._metrics_lock:
+            self._metrics['deepest_queue'] = max(self._metrics['deepest_queue'], self._queue.qsize())
+        return future
+
+    def create_set(self, metric_1, metric_2, timestamp, workout_id, exercise_id, extra_values=()) ->Future:
+        def operation(dao_manager):
+            session = dao_manager.session
+            new_set = dao_manager.get_instance(SetDAO).create_set(
+                metric_1, metric_2, timestamp,
+                get_row(session, Workout, workout_id), get_row(session, Exercise, exercise_id), extra_values
+            )
+            return new_set.id
+        return self.submit(operation)
+
+    def update_set(self, set_id, metric_1, metric_2, extra_values=None) ->Future:
+        def operation(dao_manager):
+            set_dao: SetDAO = dao_manager.get_instance(SetDAO)
+            return set_dao.update_set(get_row(dao_manager.session, Set, set_id), metric_1, metric_2, extra_values).id
+        return self.submit(operation)
+
+    def delete_set(self, set_id) ->Future:
+        def operation(dao_manager):
+            dao_manager.get_instance(SetDAO).delete_set(get_row(dao_manager.session, Set, set_id))
+            return set_id
+        return self.submit(operation)
+
+    def create_category(self, name) ->Future:
+        return self.submit(lambda dao_manager: dao_manager.get_instance(CategoryDAO).create_category(name).id)
+
+    def update_category_name(self, category_id, name) ->Future:
+        def operation(dao_manager):
+            category_dao: CategoryDAO = dao_manager.get_instance(CategoryDAO)
+            return category_dao.update_category_name(get_row(dao_manager.session, Category, category_id), name).id
+        return self.submit(operation)
+
+    def delete_category(self, category_id) ->Future:
+        def operation(dao_manager):
+            dao_manager.get_instance(CategoryDAO).delete_category(get_row(dao_manager.session, Category, category_id))
+            return category_id
+        return self.submit(operation)
+
+    def create_workout(self, workout_date) ->Future:
+        return self.submit(lambda dao_manager: dao_manager.get_instance(WorkoutDAO).create_workout(workout_date).id)
+
+    def restore_workout(self, workout_date) ->Future:
+        #The restored workout's id, or None if nothing is archived on that date
+        def operation(dao_manager):
+            workout = dao_manager.get_instance(WorkoutDAO).restore_workout(workout_date)
+            return workout.id if workout is not None else None
+        return self.submit(operation)
+
+    def delete_sets_in_workout(self, workout_id, exercise_id) ->Future:
+        def operation(dao_manager):
+            dao_manager.get_instance(ExerciseDAO).delete_sets_in_workout(workout_id, exercise_id)
+            return exercise_id
+        return self.submit(operation)
+
+    def create_exercise(self, name, category_id, metrics) ->Future:
+        #metrics is a list of (label, value_type), like the values of DAO.MEASUREMENT_TYPES
+        def operation(dao_manager):
+            exercise = dao_manager.get_instance(ExerciseDAO).create_exercise(name, get_row(dao_manager.session, Category, category_id))
+            (metric_label_1, value_type_1), (metric_label_2, value_type_2) = metrics[:2]
+            dao_manager.get_instance(ExerciseTypeDAO).create_exercise_type(
+                0, 0, metric_label_1, metric_label_2, exercise, extra_metrics=metrics[2:], value_types=(value_type_1, value_type_2)
+            )
+            return exercise.id
+        return self.submit(operation)
+
+    def delete_exercise(self, exercise_id) ->Future:
+        def operation(dao_manager):
+            dao_manager.get_instance(ExerciseDAO).delete_exercise(get_row(dao_manager.session, Exercise, exercise_id))
+            return exercise_id
+        return self.submit(operation)
+
+    def get_metrics(self) ->dict:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['average_batch'] = round(metrics['writes'] / metrics['batches'], 2) if metrics['batches'] else 0
+        return metrics
+
+    def close(self, timeout=None):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        # Block for the first write, then keep taking writes until the window closes
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        session = self.session_factory()
+        dao_manager = DAOManager(session)
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            started = time.perf_counter()
+            if not self._commit_batch(session, dao_manager, batch) and len(batch) > 1:
+                # One bad write should not fail the others, retry them one commit at a time
+                for item in batch:
+                    self._commit_batch(session, dao_manager, [item])
+            with self._metrics_lock:
+                self._metrics['batches'] += 1
+                self._metrics['last_batch_size'] = len(batch)
+                self._metrics['largest_batch'] = max(self._metrics['largest_batch'], len(batch))
+                self._metrics['last_commit_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        session.close()
+
+    def _commit_batch(self, session, dao_manager, batch) ->bool:
+        results = []
+        session.batching = True
+        try:
+            with event_bus.deferred() as events:
+                for operation, future in batch:
+                    results.append(operation(dao_manager))
+            session.batching = False
+            session.commit()
+        except Exception as error:
+            session.batching = False
+            session.rollback()
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+                with self._metrics_lock:
+                    self._metrics['failed_writes'] += 1
+            return False
+
+        with self._metrics_lock:
+            self._metrics['writes'] += len(batch)
+        for (operation, future), result in zip(batch, results):
+            future.set_result(result)
+        # Subscribers only hear about writes that are durable
+        for event in events:
+            event_bus.dispatch(event)
+        return True